@@ -30,146 +30,320 @@ Examples:
 """
 
 import argparse
+import io
 import json
+import mmap
+import re
 import sys
 from enum import Enum
 from pathlib import Path
-from typing import Optional, Union
+from typing import Any, BinaryIO, Callable, Optional, Union, cast
+
+try:
+    import orjson
+
+    _json_loads: Callable[[str], Any] = orjson.loads
+
+    # Both variants return the document newline-terminated, so the output
+    # never has to be copied just to append one
+    def _json_dumps(data: Any) -> bytes:
+        return orjson.dumps(
+            data, option=orjson.OPT_INDENT_2 | orjson.OPT_APPEND_NEWLINE
+        )
+
+except ImportError:
+    _json_loads = json.loads
+
+    def _json_dumps(data: Any) -> bytes:
+        text = json.dumps(data, indent=2, ensure_ascii=False)
+        return (text + "\n").encode("utf-8")
 
-import yaml
 
 # Import core modules
 from .core.encoder import TOPAZEncoder
 from .core.encoder_v3 import TOPAZV3Encoder
 from .core.token_budget import TokenBudget
 from .parsers.base import BaseParser
-from .parsers.junit import JUnitParser
-from .parsers.pytest import PytestParser
-from .parsers.rspec import RSpecParser
-from .parsers.tap import TAPParser
 
 VERSION = "0.3.0"
 
+# Number of leading characters inspected by detect_format
+DETECT_PREFIX_SIZE = 4096
+
+# Files larger than this are memory-mapped instead of read into memory
+MMAP_THRESHOLD = 16 * 1024 * 1024
+
+# Read-ahead buffer for streamed stdin
+STREAM_BUFFER_SIZE = 128 * 1024
+
+_NON_SPACE_RE = re.compile(rb"\S")
+
+# Leading signature of each self-identifying format, after any whitespace
+_FORMAT_SIGNATURE_RE = re.compile(
+    r"\s*(?:(?P<junit><\?xml.*?<testsuite)|(?P<tap>1\.\.|tap version)|(?P<json>\{))",
+    re.IGNORECASE | re.DOTALL,
+)
+
+_RSPEC_EXAMPLES_KEY_RE = re.compile(r'"examples"\s*:')
+
 
-class FocusMode(Enum):
+class FocusMode(str, Enum):
     SUMMARY = "summary"
     CRITICAL = "critical"
     FAILURES = "failures"
     FIRST_FAILURE = "first-failure"
     ALL = "all"  # v0.3 addition
 
+    def __str__(self) -> str:
+        return self.value
 
-class InputFormat(Enum):
+
+class InputFormat(str, Enum):
     AUTO = "auto"
     JUNIT = "junit"
     TAP = "tap"
     PYTEST = "pytest"
     RSPEC = "rspec"
 
+    def __str__(self) -> str:
+        return self.value
+
+
+# Formats identified by their _FORMAT_SIGNATURE_RE group alone
+_SIGNATURE_FORMATS: dict[Optional[str], InputFormat] = {
+    "junit": InputFormat.JUNIT,
+    "tap": InputFormat.TAP,
+}
+
 
 def detect_format(content: str) -> InputFormat:
-    """Auto-detect input format based on content patterns."""
-    content_lower = content.lower().strip()
+    """Auto-detect input format based on content patterns.
 
-    # JUnit XML detection
-    if content_lower.startswith("<?xml") and "<testsuite" in content_lower:
-        return InputFormat.JUNIT
+    Only the start of the input is inspected, and all format signatures are
+    tried in a single case-insensitive match, so large inputs are never
+    copied, lowercased, or speculatively parsed in full.
+    """
+    match = _FORMAT_SIGNATURE_RE.match(content, 0, DETECT_PREFIX_SIZE)
+    kind = match.lastgroup if match else None
 
-    # TAP detection
-    if content_lower.startswith(("1..", "tap version")):
-        return InputFormat.TAP
+    signature_format = _SIGNATURE_FORMATS.get(kind)
+    if signature_format is not None:
+        return signature_format
 
-    # RSpec JSON detection
-    try:
-        data = json.loads(content)
-        if isinstance(data, dict) and "examples" in data and "summary" in data:
-            return InputFormat.RSPEC
-    except json.JSONDecodeError:
-        pass
-
-    # pytest detection (common patterns)
-    pytest_patterns = [
-        "failed",
-        "passed",
-        "::test_",
-        "collected",
-        "assertions",
-        "traceback",
-        "assert ",
-    ]
-    if any(pattern in content_lower for pattern in pytest_patterns):
-        return InputFormat.PYTEST
-
-    # Default to pytest as most flexible fallback
+    # RSpec JSON detection - only worth a full parse if it looks like JSON
+    # and the RSpec formatter's leading "examples" key shows up early on
+    if kind == "json" and _RSPEC_EXAMPLES_KEY_RE.search(content, 0, DETECT_PREFIX_SIZE):
+        try:
+            data = _json_loads(content)
+            if isinstance(data, dict) and "examples" in data and "summary" in data:
+                return InputFormat.RSPEC
+        except json.JSONDecodeError:
+            pass
+
+    # pytest is the most flexible parser, so it doubles as the fallback and
+    # there is no need to scan for its markers
     return InputFormat.PYTEST
 
 
+# Parsers keep no per-parse state, so one shared instance per format suffices
+_PARSER_INSTANCES: dict[InputFormat, BaseParser] = {}
+
+
 def get_parser(format_type: InputFormat) -> BaseParser:
-    """Get appropriate parser for input format."""
-    parsers: dict[InputFormat, type[BaseParser]] = {
-        InputFormat.JUNIT: JUnitParser,
-        InputFormat.TAP: TAPParser,
-        InputFormat.PYTEST: PytestParser,
-        InputFormat.RSPEC: RSpecParser,
-    }
+    """Get appropriate parser for input format.
+
+    Parser modules are imported on first use, so a run only pays the import
+    cost of the format it actually reads.
+    """
+    parser = _PARSER_INSTANCES.get(format_type)
+    if parser is None:
+        parser = _PARSER_INSTANCES[format_type] = _create_parser(format_type)
+    return parser
 
-    parser_class = parsers.get(format_type, PytestParser)
-    return parser_class()
 
+def _create_parser(format_type: InputFormat) -> BaseParser:
+    """Import and instantiate the parser for a format (pytest by default)."""
+    if format_type is InputFormat.JUNIT:
+        from .parsers.junit import JUnitParser
 
-def read_input(input_file: Optional[str], max_size_mb: int = 50) -> str:
-    """Read from file or stdin with size validation.
+        return JUnitParser()
+    elif format_type is InputFormat.TAP:
+        from .parsers.tap import TAPParser
+
+        return TAPParser()
+    elif format_type is InputFormat.RSPEC:
+        from .parsers.rspec import RSpecParser
+
+        return RSpecParser()
+
+    from .parsers.pytest import PytestParser
+
+    return PytestParser()
+
+
+def read_input_bytes(input_file: str, max_size_mb: int = 50) -> Union[bytes, mmap.mmap]:
+    """Read a file as raw bytes with size validation.
+
+    Files larger than MMAP_THRESHOLD are memory-mapped rather than copied, so
+    the OS only pages in the regions the parser actually touches.
 
     Args:
-        input_file: File path or "-" for stdin
+        input_file: File path
         max_size_mb: Maximum input size in megabytes
     """
     MAX_INPUT_SIZE = max_size_mb * 1024 * 1024
 
-    if input_file and input_file != "-":
-        try:
-            # Check file size before reading
-            file_size = Path(input_file).stat().st_size
-            if file_size > MAX_INPUT_SIZE:
-                print(
-                    f"Error: File '{input_file}' is too large ({file_size / (1024 * 1024):.1f}MB). "
-                    f"Maximum size is {max_size_mb}MB",
-                    file=sys.stderr,
-                )
-                sys.exit(1)
-
-            with open(input_file, encoding="utf-8") as f:
-                content = f.read()
-                if len(content) > MAX_INPUT_SIZE:
-                    print(
-                        f"Error: File content is too large. Maximum size is {max_size_mb}MB",
-                        file=sys.stderr,
-                    )
-                    sys.exit(1)
-                return content
-        except FileNotFoundError:
-            print(f"Error: File '{input_file}' not found", file=sys.stderr)
-            sys.exit(1)
-        except UnicodeDecodeError:
-            print(f"Error: Cannot decode '{input_file}' as UTF-8", file=sys.stderr)
-            sys.exit(1)
-        except OSError as e:
-            print(f"Error: Cannot read file '{input_file}': {e}", file=sys.stderr)
+    try:
+        # Check file size before reading
+        file_size = Path(input_file).stat().st_size
+        if file_size > MAX_INPUT_SIZE:
+            print(
+                f"Error: File '{input_file}' is too large ({file_size / (1024 * 1024):.1f}MB). "
+                f"Maximum size is {max_size_mb}MB",
+                file=sys.stderr,
+            )
             sys.exit(1)
+
+        with open(input_file, "rb") as f:
+            if file_size > MMAP_THRESHOLD:
+                return mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+            # Bounded read: a file that grew after the stat (e.g. a report
+            # still being written) or reports no size (pipes, /proc) is
+            # never read past the limit
+            content = f.read(MAX_INPUT_SIZE + 1)
+    except FileNotFoundError:
+        print(f"Error: File '{input_file}' not found", file=sys.stderr)
+        sys.exit(1)
+    except OSError as e:
+        print(f"Error: Cannot read file '{input_file}': {e}", file=sys.stderr)
+        sys.exit(1)
+
+    if len(content) > MAX_INPUT_SIZE:
+        print(
+            f"Error: File content is too large. Maximum size is {max_size_mb}MB",
+            file=sys.stderr,
+        )
+        sys.exit(1)
+    return content
+
+
+def decode_input(data: Union[bytes, mmap.mmap], input_file: str) -> str:
+    """Decode raw file bytes as UTF-8 text with universal newlines."""
+    try:
+        content = str(data, "utf-8")
+    except UnicodeDecodeError:
+        print(f"Error: Cannot decode '{input_file}' as UTF-8", file=sys.stderr)
+        sys.exit(1)
+
+    # Match the newline translation of a text-mode read
+    if "\r" in content:
+        content = content.replace("\r\n", "\n").replace("\r", "\n")
+    return content
+
+
+class InputTooLargeError(ValueError):
+    """Raised when streamed input exceeds the configured size limit."""
+
+
+class LimitedReader(io.RawIOBase):
+    """Raw binary stream that fails once more than ``limit`` bytes are read.
+
+    Lets piped input be handed straight to a parser while still enforcing
+    the input size cap, which is checked incrementally as data arrives.
+    """
+
+    def __init__(self, raw: BinaryIO, limit: int, max_size_mb: int) -> None:
+        self._raw = raw
+        self._remaining = limit
+        self._max_size_mb = max_size_mb
+
+    def readable(self) -> bool:
+        return True
+
+    def readinto(self, buffer: Any) -> int:
+        if self._remaining == 0:
+            # Reaching the limit is fine; having anything left over is not
+            if self._raw.read(1):
+                raise InputTooLargeError(
+                    f"Input is too large. Maximum size is {self._max_size_mb}MB"
+                )
+            return 0
+
+        data = self._raw.read(min(len(buffer), self._remaining))
+        size = len(data)
+        buffer[:size] = data
+        self._remaining -= size
+        return size
+
+
+def open_stdin(max_size_mb: int = 50) -> io.BufferedReader:
+    """Open stdin as a size-limited binary stream that supports ``peek``."""
+    raw = LimitedReader(sys.stdin.buffer, max_size_mb * 1024 * 1024, max_size_mb)
+    return io.BufferedReader(raw, buffer_size=STREAM_BUFFER_SIZE)
+
+
+def _binary_format(head: bytes, input_format: InputFormat) -> Optional[InputFormat]:
+    """Format of input starting with ``head``, if its parser reads raw bytes.
+
+    That is JUnit XML (explicit or detected) and explicitly requested RSpec
+    JSON; auto-detected RSpec still goes through text since detection has
+    to decode the whole document anyway.
+    """
+    if input_format == InputFormat.AUTO:
+        text = str(head, "utf-8", errors="ignore")
+        if detect_format(text) == InputFormat.JUNIT:
+            return InputFormat.JUNIT
+        return None
+    if input_format in (InputFormat.JUNIT, InputFormat.RSPEC):
+        return input_format
+    return None
+
+
+def load_input(
+    input_file: Optional[str], max_size_mb: int, input_format: InputFormat
+) -> tuple[InputFormat, Union[str, BinaryIO]]:
+    """Read input and resolve its format.
+
+    JUnit (and explicit RSpec) input is returned as a binary stream so the
+    parser can work on raw bytes without decoding everything into a str
+    first: files are read (or memory-mapped when large) and stdin is
+    streamed straight through, with only its first chunk sniffed for
+    detection. All other input is returned as decoded text.
+    """
+    data: Union[bytes, mmap.mmap]
+    if input_file and input_file != "-":
+        data = read_input_bytes(input_file, max_size_mb)
+        name = input_file
     else:
-        # Read from stdin with size limit
+        stream = open_stdin(max_size_mb)
         try:
-            content = sys.stdin.read(MAX_INPUT_SIZE + 1)
-            if len(content) > MAX_INPUT_SIZE:
-                print(
-                    f"Error: Input is too large. Maximum size is {max_size_mb}MB",
-                    file=sys.stderr,
-                )
-                sys.exit(1)
-            return content
+            head = stream.peek(DETECT_PREFIX_SIZE)[:DETECT_PREFIX_SIZE]
+            binary_format = _binary_format(head, input_format)
+            if binary_format is not None and _NON_SPACE_RE.search(head):
+                return binary_format, cast(BinaryIO, stream)
+            data = stream.read()
+        except InputTooLargeError as e:
+            print(f"Error: {e}", file=sys.stderr)
+            sys.exit(1)
         except MemoryError:
             print("Error: Input is too large to process", file=sys.stderr)
             sys.exit(1)
+        name = "<stdin>"
+
+    if _NON_SPACE_RE.search(data) is None:
+        print("Error: No input provided", file=sys.stderr)
+        sys.exit(1)
+
+    binary_format = _binary_format(data[:DETECT_PREFIX_SIZE], input_format)
+    if binary_format is not None:
+        if isinstance(data, bytes):
+            return binary_format, io.BytesIO(data)
+        return binary_format, cast(BinaryIO, data)
+
+    content = decode_input(data, name)
+    if input_format == InputFormat.AUTO:
+        input_format = detect_format(content)
+    return input_format, content
 
 
 def main() -> None:
@@ -183,6 +357,7 @@ Examples:
   tpane --format junit --mode critical results.xml
   tpane --format rspec --limit 1000 rspec.json
   tpane --max-input-size 100 large-file.xml  # Allow 100MB input
+  tpane --output json results.xml           # Emit JSON instead of YAML
         """,
     )
 
@@ -195,17 +370,17 @@ Examples:
 
     parser.add_argument(
         "--format",
-        type=str,
-        choices=[f.value for f in InputFormat],
-        default="auto",
+        type=InputFormat,
+        choices=list(InputFormat),
+        default=InputFormat.AUTO,
         help="Input format (default: auto-detect)",
     )
 
     parser.add_argument(
         "--mode",
-        type=str,
-        choices=[m.value for m in FocusMode],
-        default="failures",
+        type=FocusMode,
+        choices=list(FocusMode),
+        default=FocusMode.FAILURES,
         help="Focus mode (default: failures)",
     )
 
@@ -231,6 +406,14 @@ Examples:
         help="Maximum input file size in MB (default: 50)",
     )
 
+    parser.add_argument(
+        "--output",
+        type=str,
+        choices=["yaml", "json"],
+        default="yaml",
+        help="Output serialization (default: yaml)",
+    )
+
     parser.add_argument(
         "--version", action="version", version=f"tpane {VERSION} (TOPAZ format)"
     )
@@ -238,24 +421,23 @@ Examples:
     args = parser.parse_args()
 
     try:
-        # Read input
-        content = read_input(args.input_file, args.max_input_size)
-
-        if not content.strip():
-            print("Error: No input provided", file=sys.stderr)
-            sys.exit(1)
-
-        # Detect format if auto
-        input_format = InputFormat(args.format)
-        if input_format == InputFormat.AUTO:
-            input_format = detect_format(content)
+        # Read input and detect format if auto
+        input_format, source = load_input(
+            args.input_file, args.max_input_size, args.format
+        )
 
         # Get appropriate parser
         test_parser = get_parser(input_format)
 
         # Parse test results
         try:
-            parsed_results = test_parser.parse(content)
+            if isinstance(source, str):
+                parsed_results = test_parser.parse(source)
+            else:
+                parsed_results = test_parser.parse_stream(source)
+        except InputTooLargeError as e:
+            print(f"Error: {e}", file=sys.stderr)
+            sys.exit(1)
         except Exception as e:
             print(
                 f"Error parsing {input_format.value} format: {e}",
@@ -264,15 +446,14 @@ Examples:
             sys.exit(1)
 
         # Create encoder with specified parameters
-        focus_mode = FocusMode(args.mode)
+        focus_mode: FocusMode = args.mode
         token_budget = TokenBudget(args.limit)
 
         # Choose encoder version
         encoder: Union[TOPAZV3Encoder, TOPAZEncoder]
         if args.topaz_version == "v0.3":
-            # Get command from args for v0.3 context
-            command = " ".join(sys.argv)
-            encoder = TOPAZV3Encoder(focus_mode.value, token_budget, command)
+            # The encoder derives the command for its context from sys.argv
+            encoder = TOPAZV3Encoder(focus_mode.value, token_budget)
         else:
             # Legacy v0.2 encoder
             encoder = TOPAZEncoder(focus_mode.value, token_budget)
@@ -281,15 +462,17 @@ Examples:
         try:
             topaz_output = encoder.encode(parsed_results)
 
-            # Output as YAML (more readable than JSON for this use case)
-            yaml_output = yaml.dump(
-                topaz_output,
-                default_flow_style=False,
-                sort_keys=False,
-                allow_unicode=True,
-            )
-
-            print(yaml_output)
+            if args.output == "json":
+                # JSON is much cheaper to emit for machine consumers
+                sys.stdout.buffer.write(_json_dumps(topaz_output))
+            else:
+                # Output as YAML (more readable than JSON for this use case),
+                # emitted straight to stdout rather than built up as a string.
+                # Imported here so JSON output never loads PyYAML.
+                from .core.yaml_output import write_yaml
+
+                write_yaml(topaz_output, sys.stdout.buffer)
+                sys.stdout.buffer.write(b"\n")
 
         except Exception as e:
             print(f"Error encoding TOPAZ output: {e}", file=sys.stderr)
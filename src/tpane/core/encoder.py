@@ -4,8 +4,10 @@ TOPAZ Encoder
 Converts parsed test data into standardized TOPAZ format with token optimization.
 """
 
+import os
+from itertools import chain
 from pathlib import Path
-from typing import Any, Optional
+from typing import Any, Callable, Optional
 
 from .schema import (
     FileCounts,
@@ -18,6 +20,8 @@ from .schema import (
     TestResult,
     TestType,
     TOPAZOutput,
+    is_suspicious_path,
+    shorten_normalized_path,
 )
 from .token_budget import TokenBudget
 
@@ -43,6 +47,17 @@ class TOPAZEncoder:
     ):
         self.focus_mode = focus_mode
         self.budget = token_budget or TokenBudget(2000)
+        self._cwd = Path.cwd()
+        self._cwd_prefix = os.path.join(self._cwd, "")
+        # Raw file path -> normalized path, one entry per distinct file
+        self._path_cache: dict[str, str] = {}
+        # Focus mode -> (builder, TOPAZOutput attribute it fills)
+        self._dispatch: dict[str, tuple[Callable[[ParsedTestData], Any], str]] = {
+            FocusMode.SUMMARY: (self._build_files_with_issues, "files_with_issues"),
+            FocusMode.CRITICAL: (self._build_critical_failures, "failures"),
+            FocusMode.FIRST_FAILURE: (self._build_first_failure_details, "failures"),
+            FocusMode.FAILURES: (self._build_all_failure_details, "failures"),
+        }
 
     def encode(self, parsed_data: ParsedTestData) -> dict[str, Any]:
         """Convert parsed test data to TOPAZ format."""
@@ -53,18 +68,11 @@ class TOPAZEncoder:
         # Create base TOPAZ output
         topa_output = TOPAZOutput(version=self.VERSION, summary=summary)
 
-        # Add details based on focus mode
-        if self.focus_mode == FocusMode.SUMMARY:
-            topa_output.files_with_issues = self._build_files_with_issues(parsed_data)
-
-        elif self.focus_mode == FocusMode.CRITICAL:
-            topa_output.failures = self._build_critical_failures(parsed_data)
-
-        elif self.focus_mode == FocusMode.FIRST_FAILURE:
-            topa_output.failures = self._build_first_failure_details(parsed_data)
-
-        else:  # FAILURES mode (default)
-            topa_output.failures = self._build_all_failure_details(parsed_data)
+        # Add details based on focus mode; unknown modes get FAILURES (default)
+        build, attr = self._dispatch.get(
+            self.focus_mode, self._dispatch[FocusMode.FAILURES]
+        )
+        setattr(topa_output, attr, build(parsed_data))
 
         return topa_output.to_dict()
 
@@ -92,10 +100,13 @@ class TOPAZEncoder:
     def _build_files_with_issues(self, parsed_data: ParsedTestData) -> list[FileIssues]:
         """Build file-level issue counts for summary mode."""
         files_with_issues = []
+        # The encoder never consumes tokens, so the budget is checked once
+        has_budget = self.budget.has_budget()
 
         for file_result in parsed_data.file_results:
-            if file_result.has_issues():
-                issue_count = file_result.failure_count() + file_result.error_count()
+            failures, errors = file_result.issue_counts()
+            if failures or errors:
+                issue_count = failures + errors
 
                 files_with_issues.append(
                     FileIssues(
@@ -105,7 +116,7 @@ class TOPAZEncoder:
                 )
 
                 # Budget check
-                if not self.budget.has_budget():
+                if not has_budget:
                     break
 
         return files_with_issues
@@ -115,6 +126,7 @@ class TOPAZEncoder:
     ) -> list[FileSummary]:
         """Build failure details for critical mode (errors only)."""
         failures = []
+        has_budget = self.budget.has_budget()
 
         for file_result in parsed_data.file_results:
             error_tests = [t for t in file_result.test_results if t.is_error]
@@ -134,7 +146,7 @@ class TOPAZEncoder:
                     test_results.append(test_result)
 
                     # Budget check
-                    if not self.budget.has_budget():
+                    if not has_budget:
                         break
 
                 if test_results:
@@ -146,7 +158,7 @@ class TOPAZEncoder:
                     )
 
                 # Budget check
-                if not self.budget.has_budget():
+                if not has_budget:
                     break
 
         return failures
@@ -156,19 +168,21 @@ class TOPAZEncoder:
     ) -> list[FileSummary]:
         """Build failure details for first-failure mode."""
         failures = []
+        has_budget = self.budget.has_budget()
 
         for file_result in parsed_data.file_results:
-            failed_tests = [t for t in file_result.test_results if not t.passed]
+            # Take first failure/error only; the rest are just counted, so
+            # no per-file list of failed tests is built
+            first_test = next(
+                (t for t in file_result.test_results if not t.passed), None
+            )
 
-            if failed_tests:
-                # Take first failure/error only
-                first_test = failed_tests[0]
+            if first_test is not None:
                 test_result = self._build_test_result(first_test)
 
                 # Count additional failures
-                truncated_count = (
-                    len(failed_tests) - 1 if len(failed_tests) > 1 else None
-                )
+                failed_count = sum(file_result.issue_counts())
+                truncated_count = failed_count - 1 if failed_count > 1 else None
 
                 failures.append(
                     FileSummary(
@@ -179,7 +193,7 @@ class TOPAZEncoder:
                 )
 
                 # Budget check
-                if not self.budget.has_budget():
+                if not has_budget:
                     break
 
         return failures
@@ -189,23 +203,24 @@ class TOPAZEncoder:
     ) -> list[FileSummary]:
         """Build complete failure details for failures mode."""
         failures = []
+        has_budget = self.budget.has_budget()
+        nearly_spent = self.budget.used_percentage > 80
 
         for file_result in parsed_data.file_results:
-            failed_tests = [t for t in file_result.test_results if not t.passed]
+            error_tests, failure_tests = self._partition_failed(
+                file_result.test_results
+            )
 
-            if failed_tests:
+            if error_tests or failure_tests:
                 test_results = []
 
                 # Process errors first (higher priority)
-                error_tests = [t for t in failed_tests if t.is_error]
-                failure_tests = [t for t in failed_tests if t.is_failure]
-
-                for test in error_tests + failure_tests:
+                for test in chain(error_tests, failure_tests):
                     test_result = self._build_test_result(test)
                     test_results.append(test_result)
 
                     # Budget check - leave room for at least one more file
-                    if self.budget.used_percentage > 80:
+                    if nearly_spent:
                         break
 
                 if test_results:
@@ -217,11 +232,25 @@ class TOPAZEncoder:
                     )
 
                 # Budget check
-                if not self.budget.has_budget():
+                if not has_budget:
                     break
 
         return failures
 
+    def _partition_failed(
+        self, test_results: list[ParsedTestResult]
+    ) -> tuple[list[ParsedTestResult], list[ParsedTestResult]]:
+        """Split failed tests into (errors, failures) in a single pass."""
+        errors = []
+        failures = []
+        for test in test_results:
+            if not test.passed:
+                if test.error_message is not None:
+                    errors.append(test)
+                else:
+                    failures.append(test)
+        return errors, failures
+
     def _build_test_result(self, test: ParsedTestResult) -> TestResult:
         """Build a single test result with budget awareness."""
         if test.is_error:
@@ -242,18 +271,12 @@ class TOPAZEncoder:
 
             # Add expected/actual if available
             if test.expected is not None:
-                result.expected = self.budget.smart_truncate(str(test.expected), 25)
+                result.expected = self.budget.smart_truncate(test.expected, 25)
             if test.actual is not None:
-                result.actual = self.budget.smart_truncate(str(test.actual), 25)
-
-            # Add diff if budget allows and values are strings
-            if (
-                self.budget.remaining > 100
-                and test.expected
-                and test.actual
-                and isinstance(test.expected, str)
-                and isinstance(test.actual, str)
-            ):
+                result.actual = self.budget.smart_truncate(test.actual, 25)
+
+            # Add diff if budget allows and both values are non-empty
+            if self.budget.remaining > 100 and test.expected and test.actual:
                 result.diff = self._generate_simple_diff(test.expected, test.actual)
 
             return result
@@ -263,15 +286,11 @@ class TOPAZEncoder:
         if not self.budget.has_budget(50):  # Need reasonable space for diff
             return None
 
-        # Simple line-by-line diff
-        exp_lines = expected.split("\n")
-        act_lines = actual.split("\n")
-
-        diff_lines = []
-        diff_lines.append(f"- {act_lines[0] if act_lines else '(empty)'}")
-        diff_lines.append(f"+ {exp_lines[0] if exp_lines else '(empty)'}")
-
-        diff_text = "\n".join(diff_lines)
+        # Simple diff of the first lines; partition stops at the first
+        # newline instead of splitting every line of long values
+        first_actual = actual.partition("\n")[0]
+        first_expected = expected.partition("\n")[0]
+        diff_text = f"- {first_actual}\n+ {first_expected}"
 
         # Only return if it fits in budget
         if not self.budget.would_exceed(diff_text):
@@ -280,28 +299,34 @@ class TOPAZEncoder:
         return None
 
     def _normalize_path(self, file_path: str) -> str:
-        """Normalize file path for token efficiency."""
+        """Normalize file path for token efficiency.
+
+        Results are cached, so a file reported by several suites is
+        normalized once and always maps to the same string object.
+        """
+        normalized = self._path_cache.get(file_path)
+        if normalized is None:
+            normalized = self._path_cache[file_path] = self._shorten_path(file_path)
+        return normalized
+
+    def _shorten_path(self, file_path: str) -> str:
+        """Shorten a file path, falling back to ``Path`` for unusual ones."""
         if not file_path:
             return "unknown"
 
+        # Fast path: clean relative paths and paths under the working
+        # directory are shortened without the cost of building a Path
+        shortened = shorten_normalized_path(file_path, self._cwd_prefix)
+        if shortened is not None:
+            return shortened
+
         try:
             # Convert to Path object for easier manipulation
             path = Path(file_path)
 
             # Check for potentially malicious path patterns
             path_str = str(path)
-            if any(
-                suspicious in path_str
-                for suspicious in [
-                    "../",
-                    "..\\",
-                    "/etc/",
-                    "/proc/",
-                    "/sys/",
-                    "C:\\Windows",
-                    "C:\\System32",
-                ]
-            ):
+            if is_suspicious_path(path_str):
                 # For potentially suspicious paths, use only the filename
                 return path.name or "unknown"
 
@@ -311,9 +336,9 @@ class TOPAZEncoder:
 
             # Try to make relative to current directory
             try:
-                rel_path = path.relative_to(Path.cwd())
-                if len(str(rel_path)) < len(file_path):
-                    return str(rel_path)
+                rel_path_str = str(path.relative_to(self._cwd))
+                if len(rel_path_str) < len(file_path):
+                    return rel_path_str
             except ValueError:
                 pass  # Not relative to cwd
 
@@ -340,10 +365,10 @@ class TOPAZEncoder:
                     return path.name
 
             # Fall back to basename if nothing else works
-            if len(str(path)) > 60:
+            if len(path_str) > 60:
                 return path.name
 
-            return str(path)
+            return path_str
 
         except (OSError, TypeError, ValueError, AttributeError) as e:
             # If any path processing fails, fall back to basename
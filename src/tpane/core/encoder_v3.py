@@ -9,6 +9,8 @@ import os
 import platform
 import subprocess
 import sys
+from concurrent.futures import ThreadPoolExecutor
+from functools import cache
 from pathlib import Path
 from typing import Any, Optional
 
@@ -20,11 +22,29 @@ from .schema import (
     ProjectType,
     TOPAZV3Output,
     V3FailureResult,
+    is_suspicious_path,
     normalize_environment_variables,
     normalize_flags,
+    shorten_normalized_path,
 )
 from .token_budget import TokenBudget
 
+# PROJECT_DETECTION_PATTERNS sorted once into normcased top-level names,
+# extension suffixes ("*.csproj") and nested files ("config/routes.rb")
+_PROJECT_PATTERNS: tuple[
+    tuple[ProjectType, frozenset[str], tuple[str, ...], tuple[str, ...]], ...
+] = tuple(
+    (
+        project_type,
+        frozenset(
+            os.path.normcase(p) for p in patterns if "*" not in p and "/" not in p
+        ),
+        tuple(os.path.normcase(p[1:]) for p in patterns if p.startswith("*")),
+        tuple(p for p in patterns if "/" in p),
+    )
+    for project_type, patterns in PROJECT_DETECTION_PATTERNS.items()
+)
+
 
 class TOPAZV3Encoder:
     """Encodes parsed test data into TOPAZ v0.3 format with execution context."""
@@ -40,6 +60,10 @@ class TOPAZV3Encoder:
         self.focus_mode = FocusMode(focus_mode)
         self.budget = token_budget or TokenBudget(5000)  # v0.3 default
         self.command = command or self._detect_command()
+        self._cwd = Path.cwd()
+        self._cwd_prefix = os.path.join(self._cwd, "")
+        # Raw file path -> normalized path, one entry per distinct file
+        self._path_cache: dict[str, str] = {}
 
     def encode(self, parsed_data: ParsedTestData) -> dict[str, Any]:
         """Convert parsed test data to TOPAZ v0.3 format."""
@@ -53,7 +77,7 @@ class TOPAZV3Encoder:
         )
 
         # Add content based on focus mode
-        if self.focus_mode == FocusMode.SUMMARY:
+        if self.focus_mode is FocusMode.SUMMARY:
             v3_output.summary_line = self._build_summary_line(parsed_data)
             v3_output.file_issues = self._build_file_issues(parsed_data)
         else:
@@ -67,17 +91,22 @@ class TOPAZV3Encoder:
 
         # Required fields
         pid = os.getpid()
-        pwd = str(Path.cwd())
+        pwd = str(self._cwd)
         runtime = self._detect_runtime()
         test_framework = self._detect_test_framework()
         protocol = f"TOPAZ v{self.VERSION} | focus: {self.focus_mode.value} | limit: {self.budget.limit}"
 
-        # Optional fields
-        package_manager = self._detect_package_manager()
-        vcs_info = self._detect_vcs_info()
-        environment = self._detect_environment()
-        flags = self._detect_flags()
-        project_type = self._detect_project_type()
+        # Optional fields. The subprocess probes are independent and mostly
+        # spent waiting, so they run side by side while the cheap in-process
+        # detection happens here.
+        with ThreadPoolExecutor(max_workers=2) as executor:
+            package_manager_future = executor.submit(self._detect_package_manager)
+            vcs_info_future = executor.submit(self._detect_vcs_info)
+            environment = self._detect_environment()
+            flags = self._detect_flags()
+            project_type = self._detect_project_type()
+            package_manager = package_manager_future.result()
+            vcs_info = vcs_info_future.result()
 
         return ExecutionContext(
             command=self.command,
@@ -115,12 +144,12 @@ class TOPAZV3Encoder:
     def _build_file_issues(self, parsed_data: ParsedTestData) -> dict[str, str]:
         """Build file-level issue counts for summary mode."""
         file_issues = {}
+        # Nothing below consumes tokens, so the budget is checked once
+        has_budget = self.budget.has_budget()
 
         for file_result in parsed_data.file_results:
-            if file_result.has_issues():
-                failed = file_result.failure_count()
-                errors = file_result.error_count()
-
+            failed, errors = file_result.issue_counts()
+            if failed or errors:
                 issue_parts = []
                 if failed > 0:
                     issue_parts.append(f"{failed} failed")
@@ -132,7 +161,7 @@ class TOPAZV3Encoder:
                 file_issues[normalized_path] = issue_str
 
                 # Token budget check
-                if not self.budget.has_budget():
+                if not has_budget:
                     break
 
         return file_issues
@@ -142,52 +171,54 @@ class TOPAZV3Encoder:
     ) -> dict[str, list[V3FailureResult]]:
         """Build failure details for non-summary modes."""
         failures = {}
+        critical = self.focus_mode is FocusMode.CRITICAL
+        first_only = self.focus_mode is FocusMode.FIRST_FAILURE
+        # Nothing below consumes tokens, so the budget check is loop-invariant:
+        # an exhausted budget still admits the first failure and then stops
+        has_budget = self.budget.has_budget()
 
         for file_result in parsed_data.file_results:
-            failed_tests = [t for t in file_result.test_results if not t.passed]
-
-            if not failed_tests:
-                continue
-
-            # Filter based on focus mode
-            if self.focus_mode == FocusMode.CRITICAL:
+            # Filter based on focus mode in one pass over the file's tests
+            if critical:
                 # Only errors/exceptions
-                failed_tests = [t for t in failed_tests if t.is_error]
-            elif self.focus_mode == FocusMode.FIRST_FAILURE:
-                # Only first failure per file
-                failed_tests = failed_tests[:1]
+                failed_tests = [
+                    t
+                    for t in file_result.test_results
+                    if not t.passed and t.error_message is not None
+                ]
+            elif first_only:
+                # Only first failure per file; stop scanning once found
+                first = next(
+                    (t for t in file_result.test_results if not t.passed), None
+                )
+                failed_tests = [first] if first is not None else []
+            else:
+                failed_tests = [t for t in file_result.test_results if not t.passed]
 
             if not failed_tests:
                 continue
+            if not has_budget:
+                del failed_tests[1:]
 
-            v3_failures = []
-            for test in failed_tests:
-                # Extract failure description
-                if test.is_error:
-                    description = "error occurred"
-                else:
-                    description = "test failed"
-
-                v3_failure = V3FailureResult(
+            # Every test here has failed; errors are told apart by their message
+            normalized_path = self._normalize_path(file_result.file_path)
+            failures[normalized_path] = [
+                V3FailureResult(
                     line=test.line or 0,
-                    description=description,
+                    description=(
+                        "error occurred"
+                        if test.error_message is not None
+                        else "test failed"
+                    ),
                     test_name=test.name,
                     expected=test.expected,
                     actual=test.actual,
                 )
-
-                v3_failures.append(v3_failure)
-
-                # Token budget check
-                if not self.budget.has_budget():
-                    break
-
-            if v3_failures:
-                normalized_path = self._normalize_path(file_result.file_path)
-                failures[normalized_path] = v3_failures
+                for test in failed_tests
+            ]
 
             # Token budget check
-            if not self.budget.has_budget():
+            if not has_budget:
                 break
 
         return failures
@@ -201,20 +232,7 @@ class TOPAZV3Encoder:
 
     def _detect_runtime(self) -> str:
         """Detect runtime information: language version (platform)."""
-        # Python version and platform
-        version = f"{sys.version_info.major}.{sys.version_info.minor}.{sys.version_info.micro}"
-        system = platform.system().lower()
-        machine = platform.machine().lower()
-
-        # Normalize platform names
-        if system == "darwin":
-            platform_name = f"darwin-{machine}"
-        elif system == "windows":
-            platform_name = "win64" if machine == "amd64" else "win32"
-        else:
-            platform_name = f"{system}-{machine}"
-
-        return f"python {version} ({platform_name})"
+        return _python_runtime()
 
     def _detect_test_framework(self) -> str:
         """Detect test framework and isolation mode."""
@@ -224,77 +242,23 @@ class TOPAZV3Encoder:
 
     def _detect_package_manager(self) -> Optional[str]:
         """Detect package manager and version."""
-        try:
-            # Try pip first (most common for Python)
-            result = subprocess.run(
-                ["pip", "--version"], capture_output=True, text=True, timeout=2
-            )
-            if result.returncode == 0:
-                # Parse "pip 23.0.1 from ..."
-                version_line = result.stdout.strip()
-                if "pip" in version_line:
-                    parts = version_line.split()
-                    if len(parts) >= 2:
-                        return f"pip {parts[1]}"
-        except (
-            subprocess.TimeoutExpired,
-            subprocess.SubprocessError,
-            FileNotFoundError,
-        ):
-            pass
-
-        # Could add conda, poetry, pipenv detection here
-        return None
+        return _pip_package_manager()
 
     def _detect_vcs_info(self) -> Optional[str]:
         """Detect version control system info."""
-        try:
-            # Try git
-            branch_result = subprocess.run(
-                ["git", "rev-parse", "--abbrev-ref", "HEAD"],
-                capture_output=True,
-                text=True,
-                timeout=2,
-            )
-
-            if branch_result.returncode == 0:
-                branch = branch_result.stdout.strip()
-
-                # Get short commit hash
-                commit_result = subprocess.run(
-                    ["git", "rev-parse", "--short", "HEAD"],
-                    capture_output=True,
-                    text=True,
-                    timeout=2,
-                )
-
-                if commit_result.returncode == 0:
-                    commit = commit_result.stdout.strip()
-                    return f"git {branch}@{commit}"
-                else:
-                    return f"git {branch}"
-
-        except (
-            subprocess.TimeoutExpired,
-            subprocess.SubprocessError,
-            FileNotFoundError,
-        ):
-            pass
-
-        return None
+        return _git_vcs_info(self._cwd)
 
     def _detect_environment(self) -> Optional[dict[str, str]]:
         """Detect relevant environment variables."""
-        env_vars = dict(os.environ)
-        normalized = normalize_environment_variables(env_vars)
+        normalized = normalize_environment_variables(os.environ)
 
         # Only return if we found something
         return normalized if normalized else None
 
     def _detect_flags(self) -> Optional[list[str]]:
         """Detect and normalize command-line flags."""
-        # Extract flags from command
-        if not self.command:
+        # Extract flags from command; without a dash there is nothing to split
+        if not self.command or "-" not in self.command:
             return None
 
         # Simple flag detection - look for - and -- patterns
@@ -309,43 +273,36 @@ class TOPAZV3Encoder:
 
     def _detect_project_type(self) -> Optional[ProjectType]:
         """Detect project type based on file patterns."""
-        current_dir = Path.cwd()
-
-        # Check each pattern
-        for project_type, patterns in PROJECT_DETECTION_PATTERNS.items():
-            for pattern in patterns:
-                if "*" in pattern:
-                    # Glob pattern
-                    if list(current_dir.glob(pattern)):
-                        return project_type
-                else:
-                    # Direct file check
-                    if (current_dir / pattern).exists():
-                        return project_type
-
-        return ProjectType.GENERIC
+        return _project_type_for(self._cwd)
 
     def _normalize_path(self, file_path: str) -> str:
-        """Normalize file path for token efficiency."""
+        """Normalize file path for token efficiency.
+
+        Results are cached, so a file reported by several suites is
+        normalized once and always maps to the same string object.
+        """
+        normalized = self._path_cache.get(file_path)
+        if normalized is None:
+            normalized = self._path_cache[file_path] = self._shorten_path(file_path)
+        return normalized
+
+    def _shorten_path(self, file_path: str) -> str:
+        """Shorten a file path, falling back to ``Path`` for unusual ones."""
         if not file_path:
             return "unknown"
 
+        # Fast path: clean relative paths and paths under the working
+        # directory are shortened without the cost of building a Path
+        shortened = shorten_normalized_path(file_path, self._cwd_prefix)
+        if shortened is not None:
+            return shortened
+
         try:
             path = Path(file_path)
 
             # Security check for malicious paths
             path_str = str(path)
-            suspicious_patterns = [
-                "../",
-                "..\\",
-                "/etc/",
-                "/proc/",
-                "/sys/",
-                "C:\\Windows",
-                "C:\\System32",
-            ]
-
-            if any(pattern in path_str for pattern in suspicious_patterns):
+            if is_suspicious_path(path_str):
                 return path.name or "unknown"
 
             # Prefer relative paths if shorter
@@ -354,9 +311,9 @@ class TOPAZV3Encoder:
 
             # Try to make relative to current directory
             try:
-                rel_path = path.relative_to(Path.cwd())
-                if len(str(rel_path)) < len(file_path):
-                    return str(rel_path)
+                rel_path_str = str(path.relative_to(self._cwd))
+                if len(rel_path_str) < len(file_path):
+                    return rel_path_str
             except ValueError:
                 pass
 
@@ -366,13 +323,132 @@ class TOPAZV3Encoder:
                 return "/".join(parts[-2:])
 
             # Truncate if too long
-            if len(str(path)) > 60:
+            if len(path_str) > 60:
                 return path.name
 
-            return str(path)
+            return path_str
 
         except Exception:
             try:
                 return Path(file_path).name
             except Exception:
                 return "unknown"
+
+
+# Execution context probes. Their results cannot change during a process
+# (or, for the directory-based ones, for a given directory), so each is run
+# at most once per process instead of on every encode.
+
+
+@cache
+def _python_runtime() -> str:
+    """Describe the Python runtime as "python version (platform)"."""
+    # Python version and platform
+    version = (
+        f"{sys.version_info.major}.{sys.version_info.minor}.{sys.version_info.micro}"
+    )
+    system = platform.system().lower()
+    machine = platform.machine().lower()
+
+    # Normalize platform names
+    if system == "darwin":
+        platform_name = f"darwin-{machine}"
+    elif system == "windows":
+        platform_name = "win64" if machine == "amd64" else "win32"
+    else:
+        platform_name = f"{system}-{machine}"
+
+    return f"python {version} ({platform_name})"
+
+
+@cache
+def _pip_package_manager() -> Optional[str]:
+    """Detect pip and its version."""
+    try:
+        # Try pip first (most common for Python)
+        result = subprocess.run(
+            ["pip", "--version"], capture_output=True, text=True, timeout=2
+        )
+        if result.returncode == 0:
+            # Parse "pip 23.0.1 from ..."
+            version_line = result.stdout.strip()
+            if "pip" in version_line:
+                parts = version_line.split()
+                if len(parts) >= 2:
+                    return f"pip {parts[1]}"
+    except (
+        subprocess.TimeoutExpired,
+        subprocess.SubprocessError,
+        FileNotFoundError,
+    ):
+        pass
+
+    # Could add conda, poetry, pipenv detection here
+    return None
+
+
+@cache
+def _git_vcs_info(cwd: Path) -> Optional[str]:
+    """Detect the git branch and commit checked out in ``cwd``.
+
+    Both come from a single ``git log`` call: ``%h`` is the same short hash
+    ``rev-parse --short`` prints, and ``%D`` starts with "HEAD -> <branch>"
+    on a branch or is just "HEAD" when detached (which ``rev-parse
+    --abbrev-ref`` also reports as "HEAD").
+    """
+    try:
+        # Try git
+        result = subprocess.run(
+            ["git", "log", "-1", "--no-show-signature", "--format=%h%n%D"],
+            capture_output=True,
+            text=True,
+            timeout=2,
+            cwd=cwd,
+        )
+    except (
+        subprocess.TimeoutExpired,
+        subprocess.SubprocessError,
+        FileNotFoundError,
+    ):
+        return None
+
+    if result.returncode != 0:
+        return None
+
+    commit, _, decorations = result.stdout.strip().partition("\n")
+    branch = "HEAD"
+    # Ref names cannot contain spaces, so ", " only ever separates them
+    for ref in decorations.split(", "):
+        if ref.startswith("HEAD -> "):
+            branch = ref[len("HEAD -> ") :]
+            break
+
+    return f"git {branch}@{commit}"
+
+
+@cache
+def _project_type_for(cwd: Path) -> ProjectType:
+    """Detect the project type of ``cwd`` based on file patterns.
+
+    The directory is listed once and patterns are matched against the
+    names in memory, instead of a glob or stat per pattern. Names are
+    compared through ``os.path.normcase`` so Windows stays case-insensitive.
+    """
+    try:
+        with os.scandir(cwd) as entries:
+            names = {os.path.normcase(entry.name) for entry in entries}
+    except OSError:
+        return ProjectType.GENERIC
+
+    for project_type, exact, suffixes, nested in _PROJECT_PATTERNS:
+        if not names.isdisjoint(exact):
+            return project_type
+        if suffixes and any(name.endswith(suffixes) for name in names):
+            return project_type
+        for pattern in nested:
+            # Nested file: only stat it when its top-level directory exists
+            top_level = os.path.normcase(pattern.split("/", 1)[0])
+            if top_level in names and (cwd / pattern).exists():
+                return project_type
+
+    return ProjectType.GENERIC
@@ -4,25 +4,53 @@ TOPAZ Schema Definitions
 Data structures representing the standardized TOPAZ format.
 """
 
-from dataclasses import asdict, dataclass, field
+import os
+import re
+from collections.abc import Mapping
+from dataclasses import dataclass, field, fields
 from enum import Enum
-from typing import Any, Optional
+from typing import Any, Optional, TypeVar, cast
 
+_T = TypeVar("_T")
 
-class TestStatus(Enum):
+
+def _slotted(cls: type[_T]) -> type[_T]:
+    """Rebuild a dataclass with ``__slots__`` (``slots=True`` needs 3.10+).
+
+    Instances then carry no per-object ``__dict__``, which matters for the
+    types created once per test. ``__slots__`` also keeps the field names,
+    in declaration order, so nothing needs ``fields()`` at runtime.
+    """
+    names = tuple(f.name for f in fields(cls))  # type: ignore[arg-type]
+    namespace = dict(cls.__dict__)
+    for name in names:
+        namespace.pop(name, None)
+    namespace.pop("__dict__", None)
+    namespace.pop("__weakref__", None)
+    namespace["__slots__"] = names
+    return cast(type[_T], type(cls.__name__, cls.__bases__, namespace))
+
+
+class TestStatus(str, Enum):
     """Overall test run status."""
 
     PASS = "PASS"
     FAIL = "FAIL"
     ERROR = "ERROR"
 
+    def __str__(self) -> str:
+        return self.value
+
 
-class TestType(Enum):
+class TestType(str, Enum):
     """Individual test result type."""
 
     FAILURE = "failure"
     ERROR = "error"
 
+    def __str__(self) -> str:
+        return self.value
+
 
 class FocusMode(Enum):
     """TOPAZ v0.3 focus modes for progressive disclosure."""
@@ -67,6 +95,11 @@ FLAG_MAPPINGS: dict[str, list[str]] = {
     "traces": ["-s", "--tb=long", "--traceback", "-traces"],
 }
 
+# Each raw flag mapped straight to its TOPAZ term (aliases are unique)
+_FLAG_TERMS: dict[str, str] = {
+    alias: term for term, aliases in FLAG_MAPPINGS.items() for alias in aliases
+}
+
 PROJECT_DETECTION_PATTERNS: dict[ProjectType, list[str]] = {
     ProjectType.RAILS: ["config/application.rb", "Gemfile", "config/routes.rb"],
     ProjectType.DJANGO: ["manage.py", "settings.py", "wsgi.py"],
@@ -79,16 +112,98 @@ PROJECT_DETECTION_PATTERNS: dict[ProjectType, list[str]] = {
     ProjectType.RUST_CRATE: ["Cargo.toml", "Cargo.lock"],
 }
 
+# Path fragments that suggest traversal or system locations; such paths are
+# reduced to their filename. One compiled alternation scans each path once.
+SUSPICIOUS_PATH_RE = re.compile(
+    "|".join(
+        map(
+            re.escape,
+            ["../", "..\\", "/etc/", "/proc/", "/sys/", "C:\\Windows", "C:\\System32"],
+        )
+    )
+)
+
+
+def is_suspicious_path(path: str) -> bool:
+    """Check if a path contains a SUSPICIOUS_PATH_RE fragment.
+
+    Plain substring tests rule out ordinary paths much faster than the
+    alternation; only paths containing a hint are confirmed with the regex.
+    """
+    # Every fragment contains at least one of these substrings
+    if not (
+        ".." in path
+        or "\\" in path
+        or "/etc/" in path
+        or "/proc/" in path
+        or "/sys/" in path
+    ):
+        return False
+    return SUSPICIOUS_PATH_RE.search(path) is not None
+
+
+def is_normalized_relative_path(path: str) -> bool:
+    """Check if a path is relative and already in the form pathlib gives it.
+
+    Such paths can be used as plain strings without building a ``Path``.
+    Only POSIX separators are recognised; elsewhere this is always False.
+    """
+    return (
+        os.sep == "/"
+        and not path.startswith(("/", "./"))
+        and path != "."
+        and "//" not in path
+        and "/./" not in path
+        and not path.endswith(("/", "/."))
+    )
+
 
-def normalize_environment_variables(env_dict: dict[str, str]) -> dict[str, str]:
-    """Normalize environment variables to TOPAZ standard keys."""
+def shorten_normalized_path(path: str, cwd_prefix: str) -> Optional[str]:
+    """Shorten a path the way the encoders' pathlib fallback would.
+
+    ``cwd_prefix`` is the working directory with a trailing separator.
+    Only paths in the form pathlib gives them (see
+    ``is_normalized_relative_path``), relative or under ``cwd_prefix``, are
+    handled, with plain string operations; None is returned for any other
+    path, including suspicious ones, so the caller falls back to ``Path``.
+    """
+    if path.startswith(cwd_prefix):
+        # Absolute path under the working directory: drop the prefix
+        relative = path[len(cwd_prefix) :]
+        if (
+            relative
+            and is_normalized_relative_path(relative)
+            and not is_suspicious_path(path)
+        ):
+            return relative
+        return None
+
+    if not is_normalized_relative_path(path) or is_suspicious_path(path):
+        return None
+    if len(path) < 50:
+        return path
+
+    # Long relative path: keep the last two parts, or just the filename
+    parts = path.split("/")
+    if len(parts) > 3:
+        return "/".join(parts[-2:])
+    return parts[-1] if len(path) > 60 else path
+
+
+def normalize_environment_variables(env: Mapping[str, str]) -> dict[str, str]:
+    """Normalize environment variables to TOPAZ standard keys.
+
+    Only the mapped keys are looked up, so ``os.environ`` can be passed
+    directly rather than copied into a dict first.
+    """
     normalized = {}
 
     for topa_key, possible_keys in ENVIRONMENT_MAPPINGS.items():
         for env_key in possible_keys:
-            if env_key in env_dict:
+            value = env.get(env_key)
+            if value is not None:
                 # Use the first match found
-                normalized[topa_key] = env_dict[env_key]
+                normalized[topa_key] = value
                 break
 
     return normalized
@@ -96,17 +211,10 @@ def normalize_environment_variables(env_dict: dict[str, str]) -> dict[str, str]:
 
 def normalize_flags(flags: list[str]) -> list[str]:
     """Normalize command-line flags to TOPAZ standard terms."""
-    normalized = set()
-
-    for flag in flags:
-        for topa_flag, possible_flags in FLAG_MAPPINGS.items():
-            if flag in possible_flags:
-                normalized.add(topa_flag)
-                break
-
-    return sorted(normalized)
+    return sorted({_FLAG_TERMS[flag] for flag in flags if flag in _FLAG_TERMS})
 
 
+@_slotted
 @dataclass
 class TestCounts:
     """Test execution statistics."""
@@ -117,9 +225,15 @@ class TestCounts:
     errors: int = 0
 
     def to_dict(self) -> dict[str, int]:
-        return asdict(self)
+        return {
+            "total": self.total,
+            "passed": self.passed,
+            "failed": self.failed,
+            "errors": self.errors,
+        }
 
 
+@_slotted
 @dataclass
 class FileCounts:
     """File-level statistics."""
@@ -128,9 +242,10 @@ class FileCounts:
     with_failures: int = 0
 
     def to_dict(self) -> dict[str, int]:
-        return asdict(self)
+        return {"total": self.total, "with_failures": self.with_failures}
 
 
+@_slotted
 @dataclass
 class TestResult:
     """Individual test failure or error."""
@@ -159,6 +274,7 @@ class TestResult:
         return result
 
 
+@_slotted
 @dataclass
 class FileSummary:
     """File-level test results summary."""
@@ -173,17 +289,22 @@ class FileSummary:
 
     def failure_count(self) -> int:
         """Count assertion failures."""
-        return sum(1 for t in self.tests if t.type == TestType.FAILURE)
+        return self.issue_counts()[0]
 
     def error_count(self) -> int:
         """Count errors/exceptions."""
-        return sum(1 for t in self.tests if t.type == TestType.ERROR)
+        return self.issue_counts()[1]
+
+    def issue_counts(self) -> tuple[int, int]:
+        """Count (failures, errors) from one list of test types."""
+        types = [t.type for t in self.tests]
+        return types.count(TestType.FAILURE), types.count(TestType.ERROR)
 
     def to_dict(self) -> dict[str, Any]:
         """Convert to dictionary format."""
         result: dict[str, Any] = {
             "file": self.file,
-            "tests": [test.to_dict() for test in self.tests],
+            "tests": list(map(TestResult.to_dict, self.tests)),
         }
 
         if self.truncated is not None:
@@ -192,6 +313,7 @@ class FileSummary:
         return result
 
 
+@_slotted
 @dataclass
 class Summary:
     """High-level test run summary."""
@@ -215,6 +337,7 @@ class Summary:
         return result
 
 
+@_slotted
 @dataclass
 class FileIssues:
     """Simple file-level issue count (for summary mode)."""
@@ -226,6 +349,7 @@ class FileIssues:
         return {"file": self.file, "issues": self.issues}
 
 
+@_slotted
 @dataclass
 class ExecutionContext:
     """TOPAZ v0.3 execution context with compact field formats."""
@@ -273,6 +397,7 @@ class ExecutionContext:
         return result
 
 
+@_slotted
 @dataclass
 class V3FailureResult:
     """TOPAZ v0.3 compact failure result."""
@@ -307,6 +432,7 @@ class V3FailureResult:
         return result
 
 
+@_slotted
 @dataclass
 class TOPAZOutput:
     """Complete TOPAZ format output."""
@@ -324,14 +450,17 @@ class TOPAZOutput:
         }
 
         if self.failures is not None:
-            result["failures"] = [f.to_dict() for f in self.failures]
+            result["failures"] = list(map(FileSummary.to_dict, self.failures))
 
         if self.files_with_issues is not None:
-            result["files_with_issues"] = [f.to_dict() for f in self.files_with_issues]
+            result["files_with_issues"] = list(
+                map(FileIssues.to_dict, self.files_with_issues)
+            )
 
         return result
 
 
+@_slotted
 @dataclass
 class TOPAZV3Output:
     """TOPAZ v0.3 format output with execution context."""
@@ -351,7 +480,7 @@ class TOPAZV3Output:
         """Convert to v0.3 format for serialization."""
         result: dict[str, Any] = {"EXECUTION_CONTEXT": self.execution_context.to_dict()}
 
-        if self.focus_mode == FocusMode.SUMMARY:
+        if self.focus_mode is FocusMode.SUMMARY:
             if self.summary_line:
                 result["Summary"] = self.summary_line
             if self.file_issues:
@@ -360,12 +489,15 @@ class TOPAZV3Output:
             # failures, critical, first-failure, all modes
             if self.failures:
                 for file_path, file_failures in self.failures.items():
-                    result[file_path] = [f.to_dict() for f in file_failures]
+                    result[file_path] = list(
+                        map(V3FailureResult.to_dict, file_failures)
+                    )
 
         return result
 
 
 # Parsed test data from input (before TOPAZ encoding)
+@_slotted
 @dataclass
 class ParsedTestData:
     """Raw test data parsed from various input formats."""
@@ -394,6 +526,7 @@ class ParsedTestData:
         return sum(1 for f in self.file_results if f.has_issues())
 
 
+@_slotted
 @dataclass
 class ParsedFileResult:
     """File-level results from parsed input."""
@@ -407,15 +540,26 @@ class ParsedFileResult:
 
     def failure_count(self) -> int:
         """Count assertion failures (not errors)."""
-        return sum(
-            1 for r in self.test_results if not r.passed and r.error_message is None
-        )
+        return self.issue_counts()[0]
 
     def error_count(self) -> int:
         """Count errors/exceptions."""
-        return sum(1 for r in self.test_results if r.error_message is not None)
-
-
+        return self.issue_counts()[1]
+
+    def issue_counts(self) -> tuple[int, int]:
+        """Count (failures, errors) among failed tests in a single pass."""
+        failures = 0
+        errors = 0
+        for r in self.test_results:
+            if not r.passed:
+                if r.error_message is None:
+                    failures += 1
+                else:
+                    errors += 1
+        return failures, errors
+
+
+@_slotted
 @dataclass
 class ParsedTestResult:
     """Individual test result from parsed input."""
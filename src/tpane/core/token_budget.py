@@ -58,6 +58,12 @@ class TokenBudget:
 
     def would_exceed(self, text: str) -> bool:
         """Check if adding text would exceed budget."""
+        # Estimates never exceed 1.5 characters per CHARS_PER_TOKEN (see
+        # smart_truncate), so text well inside the headroom fits unscanned
+        headroom = self.limit - self.consumed
+        if 3 * len(text) <= 2 * self.CHARS_PER_TOKEN * headroom:
+            return False
+
         estimated_tokens = self.estimate_tokens(text)
         return (self.consumed + estimated_tokens) > self.limit
 
@@ -82,6 +88,12 @@ class TokenBudget:
         if token_limit <= 0:
             return ""
 
+        # estimate_tokens never exceeds 3/8 of the length (every character
+        # counted once, plus half again for YAML punctuation, over four), so
+        # short text fits without scanning it
+        if 3 * len(text) <= 8 * token_limit:
+            return text
+
         estimated_tokens = self.estimate_tokens(text)
 
         # If text fits, return as-is
@@ -111,14 +123,18 @@ class TokenBudget:
         # Try to preserve meaningful content
         truncated = text[: target_chars - 3]
 
+        # Boundaries are only used past the halfway mark (so we don't lose
+        # too much), so the searches never look before it
+        min_boundary = target_chars // 2 + 1
+
         # Try to break at word boundaries
-        last_space = truncated.rfind(" ")
-        if last_space > target_chars // 2:  # Only if we don't lose too much
+        last_space = truncated.rfind(" ", min_boundary)
+        if last_space >= 0:
             truncated = truncated[:last_space]
 
         # Try to break at sentence boundaries
-        last_period = truncated.rfind(".")
-        if last_period > target_chars // 2:
+        last_period = truncated.rfind(".", min_boundary)
+        if last_period >= 0:
             truncated = truncated[: last_period + 1]
             return truncated  # Don't add ellipsis after period
 
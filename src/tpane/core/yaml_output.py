@@ -0,0 +1,124 @@
+"""
+TOPAZ YAML Output
+
+Serializes TOPAZ documents to YAML using PyYAML.
+"""
+
+from typing import Any, BinaryIO, Callable
+
+from yaml.events import (
+    DocumentEndEvent,
+    DocumentStartEvent,
+    Event,
+    MappingEndEvent,
+    MappingStartEvent,
+    ScalarEvent,
+    SequenceEndEvent,
+    SequenceStartEvent,
+)
+from yaml.nodes import MappingNode, Node, ScalarNode, SequenceNode
+
+try:
+    # libyaml's C emitter is several times faster than the pure-Python one
+    from yaml import CSafeDumper as _BaseDumper
+except ImportError:
+    from yaml import SafeDumper as _BaseDumper  # type: ignore[assignment]
+
+# Leaf types whose events can be reused for repeated values (mapping keys,
+# test names, statuses, line numbers). Floats are left out since 0.0 and
+# -0.0 compare equal but are written differently.
+_CACHEABLE_TYPES = (str, int, bool, type(None))
+
+
+def write_yaml(data: Any, stream: BinaryIO) -> None:
+    """Write a TOPAZ document to a binary ``stream`` as UTF-8 block-style YAML.
+
+    The plain dicts, lists and scalars of a TOPAZ document are turned into
+    emitter events directly, skipping PyYAML's representer and serializer
+    passes; the output is identical to ``yaml.safe_dump(..., sort_keys=False,
+    allow_unicode=True)`` except that repeated objects are never aliased.
+
+    Encoding here rather than through a text stream keeps non-ASCII test
+    names intact on consoles whose locale encoding is not UTF-8.
+    """
+    dumper = _BaseDumper(
+        stream,
+        encoding="utf-8",
+        default_flow_style=False,
+        sort_keys=False,
+        allow_unicode=True,
+    )
+    try:
+        dumper.open()
+        dumper.emit(DocumentStartEvent(explicit=False))
+        _emit_value(dumper, data)
+        dumper.emit(DocumentEndEvent(explicit=False))
+        dumper.close()
+    finally:
+        dumper.dispose()
+
+
+def _emit_value(dumper: Any, data: Any) -> None:
+    """Emit the events for ``data`` without building a node graph."""
+    emit: Callable[[Event], None] = dumper.emit
+    scalar_events: dict[tuple[type, Any], ScalarEvent] = {}
+
+    def scalar_event(value: Any) -> ScalarEvent:
+        key = (type(value), value)
+        event = scalar_events.get(key)
+        if event is None:
+            node = dumper.represent_data(value)
+            event = scalar_events[key] = _scalar_event(dumper, node)
+        return event
+
+    def emit_value(value: Any) -> None:
+        value_type = type(value)
+        if value_type is dict:
+            emit(MappingStartEvent(None, None, True, flow_style=False))
+            for key, item in value.items():
+                emit_value(key)
+                emit_value(item)
+            emit(MappingEndEvent())
+        elif value_type is list:
+            emit(SequenceStartEvent(None, None, True, flow_style=False))
+            for item in value:
+                emit_value(item)
+            emit(SequenceEndEvent())
+        elif value_type in _CACHEABLE_TYPES:
+            emit(scalar_event(value))
+        else:
+            _emit_node(dumper, dumper.represent_data(value))
+
+    emit_value(data)
+
+
+def _scalar_event(dumper: Any, node: ScalarNode) -> ScalarEvent:
+    """Build the event for a scalar node, as PyYAML's serializer would."""
+    implicit = (
+        node.tag == dumper.resolve(ScalarNode, node.value, (True, False)),
+        node.tag == dumper.resolve(ScalarNode, node.value, (False, True)),
+    )
+    return ScalarEvent(None, node.tag, implicit, node.value, style=node.style)
+
+
+def _emit_node(dumper: Any, node: Node) -> None:
+    """Emit the events for a node from the regular safe representers."""
+    if isinstance(node, ScalarNode):
+        dumper.emit(_scalar_event(dumper, node))
+    elif isinstance(node, SequenceNode):
+        implicit = node.tag == dumper.resolve(SequenceNode, node.value, True)
+        dumper.emit(
+            SequenceStartEvent(None, node.tag, implicit, flow_style=node.flow_style)
+        )
+        for item in node.value:
+            _emit_node(dumper, item)
+        dumper.emit(SequenceEndEvent())
+    elif isinstance(node, MappingNode):
+        implicit = node.tag == dumper.resolve(MappingNode, node.value, True)
+        dumper.emit(
+            MappingStartEvent(None, node.tag, implicit, flow_style=node.flow_style)
+        )
+        for key, value in node.value:
+            _emit_node(dumper, key)
+            _emit_node(dumper, value)
+        dumper.emit(MappingEndEvent())
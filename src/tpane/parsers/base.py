@@ -8,30 +8,93 @@ Abstract base class for all input format parsers.
 
 import re
 from abc import ABC, abstractmethod
-from typing import Any, Optional
-
-try:
-    from ..core.schema import ParsedTestData
-except ImportError:
-    # Fallback for direct execution
-    import sys
-    from pathlib import Path
-
-    sys.path.insert(0, str(Path(__file__).parent.parent))
-    from ..core.schema import ParsedTestData
+from collections.abc import Iterator
+from typing import Any, BinaryIO, Optional
+
+from ..core.schema import ParsedTestData
+
+# Patterns are compiled once here rather than looked up in re's cache per call
+_LINE_NUMBER_RE = re.compile(r"(?:line|:)?\s*(\d+)", re.IGNORECASE)
+
+# Common test name prefixes and suffixes dropped by _normalize_test_name
+_TEST_NAME_PREFIX_RE = re.compile(r"(?:test|it)_?", re.IGNORECASE)
+_TEST_NAME_SUFFIX_RE = re.compile(r"_test$", re.IGNORECASE)
+
+# Time patterns tried in order, with the unit their number is in
+_TIME_PATTERNS = (
+    (re.compile(r"(\d+(?:\.\d+)?)\s*s(?:ec(?:onds?)?)?"), "s"),  # seconds
+    (re.compile(r"(\d+(?:\.\d+)?)\s*ms(?:ec(?:onds?)?)?"), "ms"),  # milliseconds
+    (re.compile(r"(\d+(?:\.\d+)?)\s*μs"), "μs"),  # microseconds
+    (re.compile(r"(\d+(?:\.\d+)?)\s*us"), "μs"),  # microseconds (alt)
+)
+
+# File paths are runs of these characters: the first run naming a source
+# file and followed by whitespace, ":" or "[" is preferred, then the first
+# run with an inner "/". Equivalent to searching the whole text for
+#   ([a-zA-Z0-9_./\\-]+\.(?:rb|py|js|ts|java|php|go|rs|cpp|c|h))(?:\s|:|\[)
+# and then for ([a-zA-Z0-9_./\\-]+/[a-zA-Z0-9_./\\-]+), but in one pass that
+# never re-scans a run from each of its characters
+_PATH_RUN_RE = re.compile(r"[a-zA-Z0-9_./\\-]+")
+_SOURCE_FILE_RE = re.compile(r".+\.(?:rb|py|js|ts|java|php|go|rs|cpp|c|h)")
+_SOURCE_FILE_END_RE = re.compile(r"[\s:\[]")
+
+# Failure text is cut to this many characters before the assertion search;
+# the values worth reporting sit near the start of any useful message
+_ASSERTION_TEXT_LIMIT = 4096
+
+# Assertion failure formats, in the order they are tried. The first value is
+# captured in a lookahead and consumed with a backreference, so it stops
+# before a comma, newline or the closing keyword and never gives characters
+# back; with the gap after it bounded, a failed search cannot backtrack.
+_ASSERTION_FLAGS = re.IGNORECASE | re.DOTALL
+# RSpec style: expected: X, got: Y
+_RSPEC_ASSERTION_RE = re.compile(
+    r"expected:(?=(\s*(?:(?!(?:got|actual):)[^,\n])+))\1"
+    r".{0,200}?(?:got|actual):\s*([^,\n]+)",
+    _ASSERTION_FLAGS,
+)
+# pytest style: assert X == Y, where X is the actual value
+_PYTEST_ASSERTION_RE = re.compile(
+    r"assert\s+([^=\n]+)\s*==\s*([^,\n]+)", _ASSERTION_FLAGS
+)
+# Generic: Expected X but was/got Y
+_GENERIC_ASSERTION_RE = re.compile(
+    r"expected(?=(\s+(?:(?!(?:but\s+(?:was|got)|actual)\s)[^,\n])+))\1"
+    r".{0,200}?(?:but\s+(?:was|got)|actual)\s+([^,\n]+)",
+    _ASSERTION_FLAGS,
+)
 
 
 class BaseParser(ABC):
     """Abstract base class for test output parsers."""
 
     def __init__(self) -> None:
-        self.line_number_pattern = re.compile(r"(?:line|:)?\s*(\d+)", re.IGNORECASE)
+        self.line_number_pattern = _LINE_NUMBER_RE
 
     @abstractmethod
     def parse(self, content: str) -> ParsedTestData:
         """Parse test output content into structured data."""
         pass
 
+    def parse_stream(self, source: BinaryIO) -> ParsedTestData:
+        """Parse test output from a binary file-like object.
+
+        Parsers that can consume bytes incrementally override this; the
+        default decodes the whole stream and defers to ``parse``.
+        """
+        return self.parse(source.read().decode("utf-8", errors="replace"))
+
+    def _iter_lines(self, content: str) -> Iterator[str]:
+        """Yield newline-separated lines lazily instead of materializing a list."""
+        start = 0
+        while True:
+            end = content.find("\n", start)
+            if end < 0:
+                yield content[start:]
+                return
+            yield content[start:end]
+            start = end + 1
+
     def _extract_line_number(self, text: str) -> Optional[int]:
         """Extract line number from text if present."""
         match = self.line_number_pattern.search(text)
@@ -48,14 +111,16 @@ class BaseParser(ABC):
             return "unnamed test"
 
         # Remove common prefixes/suffixes
-        name = re.sub(r"^(test_?|it_?)", "", name, flags=re.IGNORECASE)
-        name = re.sub(r"_test$", "", name, flags=re.IGNORECASE)
+        prefix = _TEST_NAME_PREFIX_RE.match(name)
+        if prefix:
+            name = name[prefix.end() :]
+        # The suffix needs an underscore among the last six characters ("$"
+        # also matches before a trailing newline)
+        if "_" in name[-6:]:
+            name = _TEST_NAME_SUFFIX_RE.sub("", name)
 
-        # Convert underscores to spaces for readability
-        name = name.replace("_", " ")
-
-        # Clean up whitespace
-        name = " ".join(name.split())
+        # Convert underscores to spaces and clean up whitespace
+        name = " ".join(name.replace("_", " ").split())
 
         return name or "unnamed test"
 
@@ -68,15 +133,8 @@ class BaseParser(ABC):
         time_str = time_str.strip().lower()
 
         # Look for time patterns
-        patterns = [
-            (r"(\d+(?:\.\d+)?)\s*s(?:ec(?:onds?)?)?", "s"),  # seconds
-            (r"(\d+(?:\.\d+)?)\s*ms(?:ec(?:onds?)?)?", "ms"),  # milliseconds
-            (r"(\d+(?:\.\d+)?)\s*μs", "μs"),  # microseconds
-            (r"(\d+(?:\.\d+)?)\s*us", "μs"),  # microseconds (alt)
-        ]
-
-        for pattern, unit in patterns:
-            match = re.search(pattern, time_str)
+        for pattern, unit in _TIME_PATTERNS:
+            match = pattern.search(time_str)
             if match:
                 value = float(match.group(1))
 
@@ -98,18 +156,17 @@ class BaseParser(ABC):
 
     def _extract_file_path(self, text: str) -> Optional[str]:
         """Extract file path from text."""
-        # Look for common file path patterns
-        patterns = [
-            r"([a-zA-Z0-9_./\\-]+\.(?:rb|py|js|ts|java|php|go|rs|cpp|c|h))(?:\s|:|\[)",  # File extensions
-            r"([a-zA-Z0-9_./\\-]+/[a-zA-Z0-9_./\\-]+)",  # Path-like strings
-        ]
-
-        for pattern in patterns:
-            match = re.search(pattern, text)
-            if match:
-                return match.group(1)
-
-        return None
+        path_like = None
+        for run in _PATH_RUN_RE.finditer(text):
+            path = run.group()
+            if _SOURCE_FILE_RE.fullmatch(path) and _SOURCE_FILE_END_RE.match(
+                text, run.end()
+            ):
+                return path
+            if path_like is None and "/" in path[1:-1]:
+                path_like = path
+
+        return path_like
 
     def _is_error_message(self, text: str) -> bool:
         """Check if text looks like an error message."""
@@ -133,28 +190,20 @@ class BaseParser(ABC):
         self, text: str
     ) -> tuple[Optional[str], Optional[str]]:
         """Extract expected and actual values from assertion failure text."""
-        patterns = [
-            # RSpec style: expected: X, got: Y
-            r"expected:\s*([^,\n]+).*?(?:got|actual):\s*([^,\n]+)",
-            # pytest style: assert X == Y
-            r"assert\s+([^=\n]+)\s*==\s*([^,\n]+)",
-            # Generic: Expected X but was/got Y
-            r"expected\s+([^,\n]+).*?(?:but\s+(?:was|got)|actual)\s+([^,\n]+)",
-        ]
+        text = text[:_ASSERTION_TEXT_LIMIT]
 
-        for i, pattern in enumerate(patterns):
-            match = re.search(pattern, text, re.IGNORECASE | re.DOTALL)
-            if match:
-                if i == 1:  # pytest style: assert actual == expected
-                    # For pytest assertions, the first value is actual, second is expected
-                    actual = match.group(1).strip()
-                    expected = match.group(2).strip()
-                    return expected, actual
-                else:
-                    # For other patterns, group 1 is expected, group 2 is actual
-                    expected = match.group(1).strip()
-                    actual = match.group(2).strip()
-                    return expected, actual
+        match = _RSPEC_ASSERTION_RE.search(text)
+        if match:
+            return match.group(1).strip(), match.group(2).strip()
+
+        # For pytest assertions, the first value is actual, second is expected
+        match = _PYTEST_ASSERTION_RE.search(text)
+        if match:
+            return match.group(2).strip(), match.group(1).strip()
+
+        match = _GENERIC_ASSERTION_RE.search(text)
+        if match:
+            return match.group(1).strip(), match.group(2).strip()
 
         return None, None
 
@@ -164,17 +213,22 @@ class BaseParser(ABC):
 
         # Calculate totals from file results if not provided
         if not data.total_tests and data.file_results:
-            data.total_tests = sum(len(f.test_results) for f in data.file_results)
-            data.passed_tests = sum(
-                sum(1 for t in f.test_results if t.passed) for f in data.file_results
-            )
-            data.failed_tests = sum(
-                sum(1 for t in f.test_results if not t.passed and not t.is_error)
-                for f in data.file_results
-            )
-            data.error_tests = sum(
-                sum(1 for t in f.test_results if t.is_error) for f in data.file_results
-            )
+            # One pass over every test, counting into locals
+            total = passed = failed = errors = 0
+            for file_result in data.file_results:
+                test_results = file_result.test_results
+                total += len(test_results)
+                for test in test_results:
+                    if test.passed:
+                        passed += 1
+                    elif test.error_message is not None:
+                        errors += 1
+                    else:
+                        failed += 1
+            data.total_tests = total
+            data.passed_tests = passed
+            data.failed_tests = failed
+            data.error_tests = errors
             data.total_files = len(data.file_results)
 
         return data
@@ -6,16 +6,22 @@ JUnit XML Parser
 Parses JUnit XML test results into TOPAZ format.
 """
 
+import io
 import re
-from typing import TYPE_CHECKING
+from collections.abc import Iterable
+from typing import TYPE_CHECKING, Any, BinaryIO, Optional
 
 try:
     # Use defusedxml for security if available
     import defusedxml.ElementTree as ET
+
+    _HAS_DEFUSEDXML = True
 except ImportError:
     # Fall back to standard library
     import xml.etree.ElementTree as ET  # type: ignore[no-redef]
 
+    _HAS_DEFUSEDXML = False
+
 # For type hints, always use the standard library types
 if TYPE_CHECKING:
     import xml.etree.ElementTree as ET_types
@@ -34,6 +40,72 @@ else:
 from ..core.schema import ParsedFileResult, ParsedTestData, ParsedTestResult
 from .base import BaseParser
 
+# Stream large reports through lxml when available. An installed defusedxml
+# (the security extra) takes precedence: its parser rejects entity declarations
+# and external references, which lxml is only told not to resolve
+try:
+    from lxml import etree as lxml_etree
+except ImportError:
+    lxml_etree = None
+if _HAS_DEFUSEDXML:
+    lxml_etree = None
+
+# Syntax errors from whichever parser handles the document
+_XML_PARSE_ERRORS: tuple[type[Exception], ...] = (ET.ParseError,)
+if lxml_etree is not None:
+    _XML_PARSE_ERRORS += (lxml_etree.XMLSyntaxError,)
+
+# Predefined XML entity names, as they appear after the "&"
+_XML_ENTITY_NAMES = ("amp;", "lt;", "gt;", "quot;", "apos;")
+# Decimal or hexadecimal character reference body (e.g., "#39;", "#x27;")
+_CHAR_REF_RE = re.compile(r"#(?:\d+|x[0-9a-fA-F]+);")
+
+# Lowercased lines worth keeping when falling back to text parsing
+_TEXT_TEST_LINE_RE = re.compile(r"test|failure|error")
+
+# Testsuite attributes that may carry the source file path, in priority order
+_SUITE_FILE_ATTRS = ("file", "filename", "source")
+
+
+def _escape_stray_ampersands(content: str) -> str:
+    """Escape bare ampersands and collapse double-encoded entities in one pass.
+
+    Examples: "Tom & Jerry" → "Tom &amp; Jerry", "&amp;lt;" → "&lt;",
+    while "&amp;", "&#39;" and "&#x27;" are left untouched.
+    """
+    if "&" not in content:
+        return content
+
+    # Text is only copied around ampersands that change; valid entities are
+    # skipped over, so a well-formed document comes back as the same object
+    parts = []
+    start = 0
+    amp = content.find("&")
+    while amp >= 0:
+        pos = amp + 1
+
+        if content.startswith("amp;", pos) and content.startswith(
+            _XML_ENTITY_NAMES, pos + 4
+        ):
+            # Double-encoded entity: drop the extra "amp;"
+            parts.append(content[start:pos])
+            start = pos + 4
+        elif not (
+            content.startswith(_XML_ENTITY_NAMES, pos)
+            or _CHAR_REF_RE.match(content, pos)
+        ):
+            # Bare ampersand: keep it and add the "amp;" it lacks
+            parts.append(content[start:pos])
+            parts.append("amp;")
+            start = pos
+
+        amp = content.find("&", pos)
+
+    if not parts:
+        return content
+    parts.append(content[start:])
+    return "".join(parts)
+
 
 class JUnitParser(BaseParser):
     """Parser for JUnit XML format."""
@@ -43,19 +115,12 @@ class JUnitParser(BaseParser):
         try:
             # Clean up common XML issues
             content = self._clean_xml(content)
-            root = ET.fromstring(content)
-
-            # Handle both single testsuite and testsuites root elements
-            if root.tag == "testsuites":
-                testsuites = root.findall("testsuite")
-            elif root.tag == "testsuite":
-                testsuites = [root]
-            else:
-                raise ValueError(f"Unexpected root element: {root.tag}")
-
-            return self._parse_testsuites(testsuites)
+            source = io.BytesIO(content.encode("utf-8"))
+            # The text is already decoded, so any encoding declaration it
+            # carries no longer describes these bytes
+            return self._parse_events(self._iterparse(source, encoding="utf-8"))
 
-        except ET.ParseError as e:
+        except _XML_PARSE_ERRORS as e:
             # Fall back to text-based parsing for malformed XML
             return self._parse_as_text(content, f"XML Parse Error: {e}")
         except Exception as e:
@@ -70,69 +135,143 @@ class JUnitParser(BaseParser):
                 # Fall back for any other XML processing issues
                 return self._parse_as_text(content, f"XML Processing Error: {e}")
 
-    def _clean_xml(self, content: str) -> str:
-        """Clean up common XML formatting issues."""
-        # Remove BOM if present
-        if content.startswith("\ufeff"):
-            content = content[1:]
+    def parse_stream(self, source: BinaryIO) -> ParsedTestData:
+        """Parse JUnit XML from a binary file-like object.
 
-        # Only do minimal XML cleaning - don't escape structure tags
-        # Fix double-encoded entities (e.g., "&amp;amp;" → "&amp;")
-        # Pattern explanation: "&amp;" followed by valid XML entity names
-        # Examples: "&amp;amp;" → "&amp;", "&amp;lt;" → "&lt;"
-        content = re.sub(r"&amp;(amp|lt|gt|quot|apos);", r"&\1;", content)
-
-        # Fix unescaped ampersands that aren't part of valid XML entities
-        # Negative lookahead pattern explanation:
-        # - &(?!...): Match & not followed by the lookahead pattern
-        # - (?:amp|lt|gt|quot|apos): Standard XML entities
-        # - #\d+: Decimal character references (e.g., &#39;)
-        # - #x[0-9a-fA-F]+: Hexadecimal character references (e.g., &#x27;)
-        # Examples: "Tom & Jerry" → "Tom &amp; Jerry", but "&amp;" stays "&amp;"
-        content = re.sub(
-            r"&(?!(?:amp|lt|gt|quot|apos|#\d+|#x[0-9a-fA-F]+);)",
-            "&amp;",
-            content,
+        The document is streamed: each testcase is converted on its closing
+        tag and then discarded, so memory stays flat regardless of how many
+        testcases the report holds. Streams skip ``_clean_xml``; if parsing
+        fails and the source can be rewound, the content is re-read and
+        handed to ``parse`` for cleanup and fallback.
+        """
+        try:
+            return self._parse_events(self._iterparse(source))
+        except Exception:
+            content = self._reread(source)
+            if content is None:
+                raise
+            return self.parse(content)
+
+    def _iterparse(
+        self, source: BinaryIO, encoding: Optional[str] = None
+    ) -> Iterable[tuple[str, Any]]:
+        """Create an iterparse stream, preferring lxml when it is installed.
+
+        ``encoding`` overrides the document's own declaration. lxml is told
+        never to expand entities or touch the network, and keeps libxml2's
+        default depth and text-size limits; the ElementTree path keeps
+        whatever protection the imported module (defusedxml or stdlib)
+        gives. Both raise on malformed documents so callers can fall back.
+        """
+        if lxml_etree is None:
+            parser = ET.XMLParser(encoding=encoding) if encoding else None
+            return ET.iterparse(source, events=("start", "end"), parser=parser)
+
+        events: Iterable[tuple[str, Any]] = lxml_etree.iterparse(
+            source,
+            events=("start", "end"),
+            encoding=encoding,
+            resolve_entities=False,
+            no_network=True,
         )
+        return events
 
-        return content.strip()
-
-    def _parse_testsuites(self, testsuites: list[Element]) -> ParsedTestData:
-        """Parse multiple test suites."""
+    def _reread(self, source: BinaryIO) -> Optional[str]:
+        """Rewind a stream and return its full content as text."""
+        try:
+            source.seek(0)
+            return source.read().decode("utf-8", errors="replace")
+        except (AttributeError, OSError, ValueError):
+            return None
+
+    def _parse_events(self, events: Iterable[tuple[str, Any]]) -> ParsedTestData:
+        """Build test data from iterparse ``(event, element)`` pairs.
+
+        Only direct testsuite children of a testsuites root (or a lone
+        testsuite root) and their direct testcase children are considered.
+        Totals are kept in locals as each suite closes.
+        """
         file_results = []
+        test_results: list[ParsedTestResult] = []
         total_tests = 0
         total_failures = 0
         total_errors = 0
         total_time = 0.0
+        suite_depth = -1
+        testcase_depth = -1
+        # Open elements, innermost last
+        stack: list[Any] = []
+        # Bound once; these run for every testcase in the report
+        parse_testcase = self._parse_testcase
+        release = self._release
+
+        for event, elem in events:
+            if event == "start":
+                if not stack:
+                    if elem.tag == "testsuites":
+                        suite_depth = 1
+                    elif elem.tag == "testsuite":
+                        suite_depth = 0
+                    else:
+                        raise ValueError(f"Unexpected root element: {elem.tag}")
+                    testcase_depth = suite_depth + 1
+                stack.append(elem)
+                continue
 
-        for testsuite in testsuites:
-            # Parse testsuite attributes
-            suite_name = testsuite.get("name", "unknown")
-            suite_tests = int(testsuite.get("tests", "0"))
-            suite_failures = int(testsuite.get("failures", "0"))
-            suite_errors = int(testsuite.get("errors", "0"))
-            suite_time = float(testsuite.get("time", "0"))
-
-            # Accumulate totals
-            total_tests += suite_tests
-            total_failures += suite_failures
-            total_errors += suite_errors
-            total_time += suite_time
-
-            # Parse individual test cases
-            testcases = testsuite.findall("testcase")
-            test_results = []
-
-            for testcase in testcases:
-                test_result = self._parse_testcase(testcase)
-                test_results.append(test_result)
+            stack.pop()
+            depth = len(stack)
+            if depth == testcase_depth and elem.tag == "testcase":
+                test_results.append(parse_testcase(elem))
+                release(elem, stack[-1])
+
+            elif depth == suite_depth and elem.tag == "testsuite":
+                suite_name = elem.get("name", "unknown")
+                total_tests += int(elem.get("tests", "0"))
+                total_failures += int(elem.get("failures", "0"))
+                total_errors += int(elem.get("errors", "0"))
+                total_time += float(elem.get("time", "0"))
+
+                file_path = self._extract_file_path_from_suite(elem, suite_name)
+                file_results.append(
+                    ParsedFileResult(file_path=file_path, test_results=test_results)
+                )
+                test_results = []
+                if stack:
+                    release(elem, stack[-1])
 
-            # Create file result (use suite name as file path)
-            file_path = self._extract_file_path_from_suite(testsuite, suite_name)
-            file_results.append(
-                ParsedFileResult(file_path=file_path, test_results=test_results)
-            )
+        return self._build_suite_data(
+            file_results, total_tests, total_failures, total_errors, total_time
+        )
 
+    def _release(self, elem: Any, parent: Any) -> None:
+        """Free a processed element by emptying it and detaching it."""
+        elem.clear()
+        parent.remove(elem)
+
+    def _clean_xml(self, content: str) -> str:
+        """Clean up common XML formatting issues."""
+        # Remove BOM if present
+        if content.startswith("\ufeff"):
+            content = content[1:]
+
+        # Only do minimal XML cleaning - don't escape structure tags.
+        # Fix double-encoded entities and unescaped ampersands in one scan.
+        content = _escape_stray_ampersands(content)
+
+        # Whitespace before the XML declaration is an error, but trailing
+        # whitespace is allowed, so keep the (usually newline-terminated)
+        # document uncopied rather than strip() both ends
+        return content.lstrip()
+
+    def _build_suite_data(
+        self,
+        file_results: list[ParsedFileResult],
+        total_tests: int,
+        total_failures: int,
+        total_errors: int,
+        total_time: float,
+    ) -> ParsedTestData:
+        """Assemble ParsedTestData from accumulated testsuite totals."""
         # Calculate passed tests
         total_passed = total_tests - total_failures - total_errors
 
@@ -167,9 +306,18 @@ class JUnitParser(BaseParser):
             except ValueError:
                 pass
 
-        # Check for failures and errors
-        failure = testcase.find("failure")
-        error = testcase.find("error")
+        # Check for failures and errors in a single pass over the children;
+        # passing testcases usually have none, so this is nearly free
+        failure: Optional[Element] = None
+        error: Optional[Element] = None
+        for child in testcase:
+            tag = child.tag
+            if tag == "failure":
+                if failure is None:
+                    failure = child
+            elif tag == "error":
+                if error is None:
+                    error = child
 
         if error is not None:
             # This is an error (exception)
@@ -210,51 +358,39 @@ class JUnitParser(BaseParser):
     def _extract_file_path_from_suite(self, testsuite: Element, suite_name: str) -> str:
         """Extract file path from testsuite element."""
         # Look for file-related attributes
-        file_attrs = ["file", "filename", "source"]
-        for attr in file_attrs:
+        for attr in _SUITE_FILE_ATTRS:
             file_path = testsuite.get(attr)
             if file_path:
                 return file_path
 
-        # Try to extract from suite name
+        # Try to extract from suite name; names with any separator, including
+        # package-style ones (com.example.Test), are used as-is
         if "/" in suite_name or "\\" in suite_name or "." in suite_name:
             # Looks like a file path
             return suite_name
 
-        # Check for package-style naming (com.example.Test -> com/example/Test)
-        if "." in suite_name:
-            parts = suite_name.split(".")
-            if len(parts) > 1:
-                # Assume last part is class name, others are package
-                return "/".join(parts[:-1]) + "/" + parts[-1] + ".java"
-
         # Fall back to suite name with common extension
         return suite_name + ".java"
 
     def _parse_as_text(self, content: str, error_context: str) -> ParsedTestData:
         """Fallback text-based parsing for malformed XML."""
-        lines = content.split("\n")
-
         # Try to extract basic information from text
         test_results = []
 
-        for line in lines:
+        for line in self._iter_lines(content):
             line = line.strip()
             if not line:
                 continue
 
             # Look for test-like patterns
-            if (
-                "test" in line.lower()
-                or "failure" in line.lower()
-                or "error" in line.lower()
-            ):
+            lowered = line.lower()
+            if _TEXT_TEST_LINE_RE.search(lowered):
                 # Extract test name if possible
                 test_name = line
 
                 # Determine if it's a failure/error
-                passed = "failure" not in line.lower() and "error" not in line.lower()
-                is_error = "error" in line.lower()
+                is_error = "error" in lowered
+                passed = not is_error and "failure" not in lowered
 
                 test_result = ParsedTestResult(
                     name=self._normalize_test_name(test_name),
@@ -13,6 +13,23 @@ from typing import Optional
 from ..core.schema import ParsedFileResult, ParsedTestData, ParsedTestResult
 from .base import BaseParser
 
+# Pytest output patterns, compiled once at import
+_TEST_LINE_RE = re.compile(r"^([^\s:]+(?:\.py)?):?:?(\w+)?\s+(.*)$")
+_FAILURE_RE = re.compile(r"^FAILED\s+([^:\s]+(?:\.py)?):?:?(\w+)?\s*-?\s*(.*)$")
+_ERROR_RE = re.compile(r"^ERROR\s+([^:\s]+(?:\.py)?):?:?(\w+)?\s*-?\s*(.*)$")
+_PASSED_RE = re.compile(r"^PASSED\s+([^:\s]+(?:\.py)?):?:?(\w+)?")
+_SUMMARY_RE = re.compile(
+    r"=+\s*(\d+)\s+failed(?:,\s*(\d+)\s+passed)?(?:,\s*(\d+)\s+error)?.*?in\s+([\d.]+s?)"
+)
+_ASSERTION_RE = re.compile(
+    r"assert\s+(.+?)\s*(?:==|!=|<|>|<=|>=|is|in)\s*(.+?)(?:\s*$|\s*#)",
+    re.IGNORECASE,
+)
+# Literal starts of the FAILED, ERROR and PASSED patterns
+_RESULT_PREFIXES = ("FAILED", "ERROR", "PASSED")
+# Everything up to the first "::" of a node ID
+_NODE_ID_PREFIX_RE = re.compile(r"^.*?::")
+
 
 class PytestParser(BaseParser):
     """Parser for pytest console output."""
@@ -20,27 +37,13 @@ class PytestParser(BaseParser):
     def __init__(self) -> None:
         super().__init__()
 
-        # Pytest output patterns
-        self.test_line_pattern = re.compile(r"^([^\s:]+(?:\.py)?):?:?(\w+)?\s+(.*)$")
-
-        self.failure_pattern = re.compile(
-            r"^FAILED\s+([^:\s]+(?:\.py)?):?:?(\w+)?\s*-?\s*(.*)$"
-        )
-
-        self.error_pattern = re.compile(
-            r"^ERROR\s+([^:\s]+(?:\.py)?):?:?(\w+)?\s*-?\s*(.*)$"
-        )
-
-        self.passed_pattern = re.compile(r"^PASSED\s+([^:\s]+(?:\.py)?):?:?(\w+)?")
-
-        self.summary_pattern = re.compile(
-            r"=+\s*(\d+)\s+failed(?:,\s*(\d+)\s+passed)?(?:,\s*(\d+)\s+error)?.*?in\s+([\d.]+s?)"
-        )
-
-        self.assertion_pattern = re.compile(
-            r"assert\s+(.+?)\s*(?:==|!=|<|>|<=|>=|is|in)\s*(.+?)(?:\s*$|\s*#)",
-            re.IGNORECASE,
-        )
+        # Pytest output patterns, shared by every instance
+        self.test_line_pattern = _TEST_LINE_RE
+        self.failure_pattern = _FAILURE_RE
+        self.error_pattern = _ERROR_RE
+        self.passed_pattern = _PASSED_RE
+        self.summary_pattern = _SUMMARY_RE
+        self.assertion_pattern = _ASSERTION_RE
 
     def parse(self, content: str) -> ParsedTestData:
         """Parse pytest console output."""
@@ -56,15 +59,21 @@ class PytestParser(BaseParser):
         error_count = 0
         elapsed_time = None
 
-        # Parse mode
+        # Bound once; these run for every line of the output
+        summary_search = self.summary_pattern.search
+        failure_match_line = self.failure_pattern.match
+        error_match_line = self.error_pattern.match
+        passed_match_line = self.passed_pattern.match
 
         for i, line in enumerate(lines):
             line = line.strip()
             if not line:
                 continue
 
+            # Each pattern needs a literal the line must contain (or start
+            # with), and most lines have none, so that is checked first.
             # Check for summary line first
-            summary_match = self.summary_pattern.search(line)
+            summary_match = summary_search(line) if "=" in line else None
             if summary_match:
                 failed_count = int(summary_match.group(1))
                 passed_count = int(summary_match.group(2) or 0)
@@ -74,7 +83,9 @@ class PytestParser(BaseParser):
                 continue
 
             # Check for FAILED lines
-            failure_match = self.failure_pattern.match(line)
+            failure_match = (
+                failure_match_line(line) if line.startswith("FAILED") else None
+            )
             if failure_match:
                 file_path = failure_match.group(1)
                 test_name = failure_match.group(2) or "unknown"
@@ -105,7 +116,7 @@ class PytestParser(BaseParser):
                 continue
 
             # Check for ERROR lines
-            error_match = self.error_pattern.match(line)
+            error_match = error_match_line(line) if line.startswith("ERROR") else None
             if error_match:
                 file_path = error_match.group(1)
                 test_name = error_match.group(2) or "unknown"
@@ -124,7 +135,9 @@ class PytestParser(BaseParser):
                 continue
 
             # Check for PASSED lines
-            passed_match = self.passed_pattern.match(line)
+            passed_match = (
+                passed_match_line(line) if line.startswith("PASSED") else None
+            )
             if passed_match:
                 file_path = passed_match.group(1)
                 test_name = passed_match.group(2) or "unknown"
@@ -138,20 +151,6 @@ class PytestParser(BaseParser):
 
             # Skip unmatched lines
 
-        # If we couldn't parse summary, calculate from parsed tests
-        if total_tests == 0:
-            total_tests = sum(len(tests) for tests in file_tests.values())
-            passed_count = sum(
-                sum(1 for t in tests if t.passed) for tests in file_tests.values()
-            )
-            failed_count = sum(
-                sum(1 for t in tests if not t.passed and not t.is_error)
-                for tests in file_tests.values()
-            )
-            error_count = sum(
-                sum(1 for t in tests if t.is_error) for tests in file_tests.values()
-            )
-
         # Convert to file results
         file_results = []
         for file_path, tests in file_tests.items():
@@ -195,7 +194,8 @@ class PytestParser(BaseParser):
                 ParsedFileResult(file_path="pytest_output", test_results=generic_tests)
             )
 
-        return ParsedTestData(
+        # Without a summary line, the totals are counted from the parsed tests
+        return self._build_test_data(
             total_tests=total_tests,
             passed_tests=passed_count,
             failed_tests=failed_count,
@@ -214,13 +214,10 @@ class PytestParser(BaseParser):
             line = lines[i].strip()
 
             # Stop at next test result or empty lines
-            if any(
-                pattern.match(line)
-                for pattern in [
-                    self.failure_pattern,
-                    self.error_pattern,
-                    self.passed_pattern,
-                ]
+            if line.startswith(_RESULT_PREFIXES) and (
+                self.failure_pattern.match(line)
+                or self.error_pattern.match(line)
+                or self.passed_pattern.match(line)
             ):
                 break
 
@@ -247,7 +244,7 @@ class PytestParser(BaseParser):
             return "unknown"
 
         # Remove pytest-specific prefixes
-        file_path = re.sub(r"^.*?::", "", file_path)
+        file_path = _NODE_ID_PREFIX_RE.sub("", file_path)
 
         # Ensure .py extension if it looks like a Python file
         if "/" in file_path or "_test" in file_path or "test_" in file_path:
@@ -7,11 +7,33 @@ Parses RSpec JSON output into TOPAZ format.
 """
 
 import json
-from typing import Any
+import re
+from collections import defaultdict
+from typing import Any, BinaryIO, Callable, Union
+
+try:
+    # orjson decodes large reports several times faster than the stdlib
+    import orjson
+
+    _json_loads: Callable[[Union[str, bytes]], Any] = orjson.loads
+except ImportError:
+    _json_loads = json.loads
 
 from ..core.schema import ParsedFileResult, ParsedTestData, ParsedTestResult
 from .base import BaseParser
 
+# Lowercased lines worth keeping when falling back to text parsing
+_TEXT_EXAMPLE_LINE_RE = re.compile(r"example|spec|failure|error")
+
+# Exception classes RSpec uses for assertion failures (anything else is an error)
+_RSPEC_FAILURE_EXCEPTIONS = frozenset(
+    {
+        "RSpec::Expectations::ExpectationNotMetError",
+        "ExpectationNotMetError",
+        "Failure",
+    }
+)
+
 
 class RSpecParser(BaseParser):
     """Parser for RSpec JSON format."""
@@ -19,20 +41,38 @@ class RSpecParser(BaseParser):
     def parse(self, content: str) -> ParsedTestData:
         """Parse RSpec JSON content."""
         try:
-            data = json.loads(content)
+            data = _json_loads(content)
+        except json.JSONDecodeError as e:
+            # Fall back to text parsing (orjson.JSONDecodeError is a subclass)
+            return self._parse_as_text(content, f"JSON Parse Error: {e}")
 
-            # Validate expected structure
-            if not isinstance(data, dict):
-                raise ValueError("Expected JSON object at root")
+        return self._parse_document(data)
 
-            if "examples" not in data:
-                raise ValueError("Missing 'examples' in RSpec JSON")
+    def parse_stream(self, source: BinaryIO) -> ParsedTestData:
+        """Parse RSpec JSON from a binary file-like object.
 
-            return self._parse_rspec_json(data)
+        The JSON decoder reads the raw UTF-8 bytes itself, so the report is
+        never copied into an intermediate str; only input that fails to
+        decode is converted to text for the fallback in ``parse``.
+        """
+        content = source.read()
+        try:
+            data = _json_loads(content)
+        except (json.JSONDecodeError, UnicodeDecodeError):
+            return self.parse(content.decode("utf-8", errors="replace"))
 
-        except json.JSONDecodeError as e:
-            # Fall back to text parsing
-            return self._parse_as_text(content, f"JSON Parse Error: {e}")
+        return self._parse_document(data)
+
+    def _parse_document(self, data: Any) -> ParsedTestData:
+        """Validate a decoded JSON document and parse it."""
+        # Validate expected structure
+        if not isinstance(data, dict):
+            raise ValueError("Expected JSON object at root")
+
+        if "examples" not in data:
+            raise ValueError("Missing 'examples' in RSpec JSON")
+
+        return self._parse_rspec_json(data)
 
     def _parse_rspec_json(self, data: dict[str, Any]) -> ParsedTestData:
         """Parse RSpec JSON structure."""
@@ -57,17 +97,17 @@ class RSpecParser(BaseParser):
 
         # Parse individual examples (tests)
         examples = data.get("examples", [])
-        file_tests: dict[str, list[ParsedTestResult]] = {}  # Group by file
+        file_tests: defaultdict[str, list[ParsedTestResult]] = defaultdict(list)
 
-        for example in examples:
-            test_result = self._parse_example(example)
-            file_path = example.get("file_path", "unknown_spec.rb")
+        # Bind per-example helpers once; large reports have 10k+ examples
+        parse_example = self._parse_example
+        clean_file_path = self._clean_rspec_file_path
 
-            # Clean up file path
-            file_path = self._clean_rspec_file_path(file_path)
+        for example in examples:
+            test_result = parse_example(example)
 
-            if file_path not in file_tests:
-                file_tests[file_path] = []
+            # Group by cleaned file path
+            file_path = clean_file_path(example.get("file_path", "unknown_spec.rb"))
             file_tests[file_path].append(test_result)
 
         # Convert to file results
@@ -147,15 +187,8 @@ class RSpecParser(BaseParser):
 
     def _is_rspec_error(self, exception_class: str) -> bool:
         """Determine if exception class represents an error vs assertion failure."""
-        # RSpec assertion failures typically use specific exception types
-        failure_exceptions = [
-            "RSpec::Expectations::ExpectationNotMetError",
-            "ExpectationNotMetError",
-            "Failure",
-        ]
-
-        # Anything else is likely a real error/exception
-        return exception_class not in failure_exceptions
+        # Anything other than an assertion failure is likely a real error
+        return exception_class not in _RSPEC_FAILURE_EXCEPTIONS
 
     def _clean_rspec_file_path(self, file_path: str) -> str:
         """Clean up RSpec file paths."""
@@ -171,26 +204,22 @@ class RSpecParser(BaseParser):
 
     def _parse_as_text(self, content: str, error_context: str) -> ParsedTestData:
         """Fallback text parsing for malformed JSON."""
-        lines = content.split("\n")
-
         test_results = []
 
         # Look for common RSpec text patterns
-        for line in lines:
+        for line in self._iter_lines(content):
             line = line.strip()
             if not line:
                 continue
 
             # Look for failure/example patterns
-            if any(
-                pattern in line.lower()
-                for pattern in ["example", "spec", "failure", "error"]
-            ):
+            lowered = line.lower()
+            if _TEXT_EXAMPLE_LINE_RE.search(lowered):
                 test_name = line
 
                 # Determine status
-                passed = "failure" not in line.lower() and "error" not in line.lower()
-                is_error = "error" in line.lower()
+                is_error = "error" in lowered
+                passed = not is_error and "failure" not in lowered
 
                 test_result = ParsedTestResult(
                     name=self._normalize_test_name(test_name),
@@ -11,6 +11,20 @@ import re
 from ..core.schema import ParsedFileResult, ParsedTestData, ParsedTestResult
 from .base import BaseParser
 
+# TAP format patterns, compiled once at import
+_PLAN_RE = re.compile(r"^1\.\.(\d+)(?:\s*#\s*(.*))?$")
+_TEST_RE = re.compile(r"^(ok|not ok)(?:\s+(\d+))?(?:\s*-?\s*(.*))?$", re.IGNORECASE)
+_DIRECTIVE_RE = re.compile(r"#\s*(SKIP|TODO|FIXME)(?:\s+(.*))?$", re.IGNORECASE)
+_DIAGNOSTIC_RE = re.compile(r"^#\s*(.*)$")
+# Plan, test and diagnostic lines in one alternation, tried in that order, so
+# each line is classified (and its fields captured) by a single match
+_LINE_RE = re.compile(
+    r"^(?:1\.\.(?P<planned>\d+)(?:\s*#\s*(?P<plan_desc>.*))?"
+    r"|(?P<status>ok|not ok)(?:\s+(?P<number>\d+))?(?:\s*-?\s*(?P<description>.*))?"
+    r"|#\s*(?P<diagnostic>.*))$",
+    re.IGNORECASE,
+)
+
 
 class TAPParser(BaseParser):
     """Parser for TAP (Test Anything Protocol) format."""
@@ -18,15 +32,12 @@ class TAPParser(BaseParser):
     def __init__(self) -> None:
         super().__init__()
 
-        # TAP format patterns
-        self.plan_pattern = re.compile(r"^1\.\.(\d+)(?:\s*#\s*(.*))?$")
-        self.test_pattern = re.compile(
-            r"^(ok|not ok)(?:\s+(\d+))?(?:\s*-?\s*(.*))?$", re.IGNORECASE
-        )
-        self.directive_pattern = re.compile(
-            r"#\s*(SKIP|TODO|FIXME)(?:\s+(.*))?$", re.IGNORECASE
-        )
-        self.diagnostic_pattern = re.compile(r"^#\s*(.*)$")
+        # TAP format patterns, shared by every instance
+        self.plan_pattern = _PLAN_RE
+        self.test_pattern = _TEST_RE
+        self.directive_pattern = _DIRECTIVE_RE
+        self.diagnostic_pattern = _DIAGNOSTIC_RE
+        self.line_pattern = _LINE_RE
 
     def parse(self, content: str) -> ParsedTestData:
         """Parse TAP format content."""
@@ -36,34 +47,40 @@ class TAPParser(BaseParser):
         planned_tests = 0
         current_file = "tap_output"
         pending_diagnostics: list[str] = []
+        # Outcome counts, kept as results are appended
+        passed_tests = failed_tests = error_tests = 0
+        # Bound once; this runs for every line of output
+        line_match_fn = self.line_pattern.match
 
         for line_num, line in enumerate(lines):
             line = line.strip()
             if not line:
                 continue
 
-            # Check for plan line (1..N)
-            plan_match = self.plan_pattern.match(line)
-            if plan_match:
-                planned_tests = int(plan_match.group(1))
-                if plan_match.group(2):
+            line_match = line_match_fn(line)
+            if not line_match:
+                continue
+            status, planned, diagnostic = line_match.group(
+                "status", "planned", "diagnostic"
+            )
+
+            # Plan line (1..N)
+            if planned is not None:
+                planned_tests = int(planned)
+                plan_desc = line_match.group("plan_desc")
+                if plan_desc:
                     # Plan has description, might include file info
-                    plan_desc = plan_match.group(2)
                     file_path = self._extract_file_path(plan_desc)
                     if file_path:
                         current_file = file_path
                 continue
 
-            # Check for test result line
-            test_match = self.test_pattern.match(line)
-            if test_match:
-                status = test_match.group(1).lower()
-                test_number = (
-                    int(test_match.group(2))
-                    if test_match.group(2)
-                    else len(test_results) + 1
-                )
-                description = test_match.group(3) or f"test {test_number}"
+            # Test result line
+            if status is not None:
+                status = status.lower()
+                number = line_match.group("number")
+                test_number = int(number) if number else len(test_results) + 1
+                description = line_match.group("description") or f"test {test_number}"
 
                 # Check for directives (SKIP, TODO, etc.)
                 directive_match = self.directive_pattern.search(description)
@@ -131,13 +148,18 @@ class TAPParser(BaseParser):
 
                     pending_diagnostics = []  # Clear used diagnostics
 
+                if passed:
+                    passed_tests += 1
+                elif test_result.error_message is not None:
+                    error_tests += 1
+                else:
+                    failed_tests += 1
                 test_results.append(test_result)
                 continue
 
-            # Check for diagnostic line (comments)
-            diagnostic_match = self.diagnostic_pattern.match(line)
-            if diagnostic_match:
-                diagnostic = diagnostic_match.group(1).strip()
+            # Diagnostic line (comments)
+            if diagnostic is not None:
+                diagnostic = diagnostic.strip()
 
                 # Skip empty diagnostics and directives we've already handled
                 if not diagnostic or diagnostic.upper().startswith(
@@ -159,11 +181,7 @@ class TAPParser(BaseParser):
                 pending_diagnostics.append(diagnostic)
                 continue
 
-        # Calculate statistics
         total_tests = len(test_results)
-        passed_tests = sum(1 for t in test_results if t.passed)
-        failed_tests = sum(1 for t in test_results if not t.passed and not t.is_error)
-        error_tests = sum(1 for t in test_results if t.is_error)
 
         # Check if we have the expected number of tests
         if planned_tests > 0 and total_tests != planned_tests:
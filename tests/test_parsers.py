@@ -10,6 +10,7 @@ from pathlib import Path
 # Add src to path for imports
 sys.path.insert(0, str(Path(__file__).parent.parent / "src"))
 
+from tpane.core.schema import ParsedFileResult, ParsedTestResult
 from tpane.parsers.junit import JUnitParser
 from tpane.parsers.pytest import PytestParser
 from tpane.parsers.rspec import RSpecParser
@@ -65,6 +66,112 @@ class TestJUnitParser(unittest.TestCase):
         self.assertTrue(error_test.is_error)
         self.assertIn("NullPointerException", error_test.error_message)
 
+    def test_clean_xml_entities(self):
+        cases = [
+            ("Tom & Jerry", "Tom &amp; Jerry"),
+            ("&amp;amp; &amp;lt;", "&amp; &lt;"),
+            ("&amp; &lt; &#39; &#x27;", "&amp; &lt; &#39; &#x27;"),
+            ("&#xZZ; &#;", "&amp;#xZZ; &amp;#;"),
+            ("no entities", "no entities"),
+        ]
+
+        for raw, cleaned in cases:
+            with self.subTest(raw=raw):
+                self.assertEqual(self.parser._clean_xml(raw), cleaned)
+
+    def test_clean_xml_leaves_well_formed_content_uncopied(self):
+        xml_content = '<?xml version="1.0"?>\n<testsuite tests="0"/>\n'
+        self.assertIs(self.parser._clean_xml(xml_content), xml_content)
+
+        with_entities = '<testsuite name="a &lt; b &amp;&#38; c"/>\n'
+        self.assertIs(self.parser._clean_xml(with_entities), with_entities)
+
+    def test_parse_stream_matches_parse(self):
+        import io
+
+        xml_content = """<?xml version="1.0" encoding="UTF-8"?>
+<testsuites>
+  <testsuite name="SuiteA" file="spec/a_test.py" tests="2" failures="1" time="0.5">
+    <testcase name="test_pass"/>
+    <testcase name="test_fail" line="12">
+      <failure message="expected: 1, got: 2">Assertion failed</failure>
+    </testcase>
+  </testsuite>
+  <testsuite name="SuiteB" tests="1" errors="1" time="0.25">
+    <testcase name="test_error"><error message="Boom">trace</error></testcase>
+  </testsuite>
+</testsuites>"""
+
+        streamed = self.parser.parse_stream(io.BytesIO(xml_content.encode("utf-8")))
+
+        self.assertEqual(streamed, self.parser.parse(xml_content))
+        self.assertEqual(streamed.total_tests, 3)
+        self.assertEqual(len(streamed.file_results), 2)
+        self.assertEqual(streamed.file_results[0].file_path, "spec/a_test.py")
+        self.assertEqual(streamed.file_results[0].test_results[1].line, 12)
+
+    def test_parse_stream_releases_processed_elements(self):
+        import io
+
+        xml_content = b"""<testsuites>
+  <testsuite name="A" tests="2"><testcase name="a"><failure message="x"/></testcase>
+    <testcase name="b"/><system-out>log</system-out></testsuite>
+  <testsuite name="B" tests="1"><testcase name="c"/></testsuite>
+</testsuites>"""
+        elements = []
+
+        def recorded(source):
+            for event, elem in self.parser._iterparse(source):
+                elements.append(elem)
+                yield event, elem
+
+        result = self.parser._parse_events(recorded(io.BytesIO(xml_content)))
+
+        # Suites and testcases are detached once converted, so memory is bounded
+        # by one testcase rather than the whole document
+        self.assertEqual(result.total_tests, 3)
+        self.assertEqual(len(elements[0]), 0)
+        self.assertEqual(sum(len(elem) for elem in elements), 0)
+
+    def test_parse_stream_recovers_invalid_utf8(self):
+        import io
+        from unittest import mock
+
+        import tpane.parsers.junit as junit
+
+        xml_content = b'<testsuite tests="1"><testcase name="caf\xe9"/></testsuite>'
+
+        # ElementTree rejects the stream; the re-read text parse recovers it
+        for lxml_etree in (junit.lxml_etree, None):
+            with mock.patch.object(junit, "lxml_etree", lxml_etree):
+                result = self.parser.parse_stream(io.BytesIO(xml_content))
+            with self.subTest(lxml=lxml_etree is not None):
+                self.assertEqual(result.total_tests, 1)
+                self.assertEqual(
+                    result.file_results[0].test_results[0].name, "caf\ufffd"
+                )
+
+    def test_stdlib_fallback_matches_lxml(self):
+        from unittest import mock
+
+        import tpane.parsers.junit as junit
+
+        xml_content = """<?xml version="1.0" encoding="UTF-8"?>
+<testsuites>
+  <testsuite name="com.example.Suite" tests="3" failures="1" errors="1">
+    <properties><property name="k" value="v"/></properties>
+    <testcase name="test_pass"><system-out>log</system-out></testcase>
+    <testcase name="test_fail"><failure message="expected: 1, got: 2"/></testcase>
+    <testcase name="test_error"><error message="Boom">trace</error></testcase>
+    <system-out>suite log</system-out>
+  </testsuite>
+</testsuites>"""
+
+        expected = self.parser.parse(xml_content)
+        with mock.patch.object(junit, "lxml_etree", None):
+            self.assertEqual(self.parser.parse(xml_content), expected)
+        self.assertEqual(len(expected.file_results[0].test_results), 3)
+
 
 class TestPytestParser(unittest.TestCase):
     """Test pytest output parser."""
@@ -92,6 +199,42 @@ ERROR test_auth.py::test_login - NameError: name 'AuthService' is not defined
         self.assertEqual(expected, "True")  # What we expected to be true
         self.assertEqual(actual, "False")  # What we actually got
 
+    def test_patterns_are_shared_between_instances(self):
+        other = PytestParser()
+        self.assertIs(other.failure_pattern, self.parser.failure_pattern)
+        self.assertIs(TAPParser().test_pattern, TAPParser().test_pattern)
+        self.assertEqual(self.parser._clean_file_path("pkg::mod/a.py"), "mod/a.py")
+
+    def test_normalize_test_name(self):
+        cases = [
+            ("test_user_can_login", "user can login"),
+            ("IT_handles_input", "handles input"),
+            ("login_TEST", "login"),
+            ("test_login_test\n", "login"),
+            ("test_x_test_y", "x test y"),
+            ("  a__b\tc ", "a b c"),
+            ("test", "unnamed test"),
+            ("", "unnamed test"),
+        ]
+        for name, normalized in cases:
+            with self.subTest(name=name):
+                self.assertEqual(self.parser._normalize_test_name(name), normalized)
+
+    def test_extract_assertion_values_formats(self):
+        cases = [
+            ("expected: 1, got: 2", ("1", "2")),
+            ("expected: 1 got: 2", ("1", "2")),
+            ("Failure/Error:\n\n  expected: 2\n       got: 3\n", ("2", "3")),
+            ("expected: x\nactual: y", ("x", "y")),
+            ("AssertionError: assert {'a': 1} == {'a': 2}", ("{'a': 2}", "{'a': 1}")),
+            ("Expected 3 but was 4", ("3", "4")),
+            ("expected 5 but got 6", ("5", "6")),
+            ("expected:<foo> but was:<bar>", (None, None)),
+        ]
+        for text, values in cases:
+            with self.subTest(text=text):
+                self.assertEqual(self.parser._extract_assertion_values(text), values)
+
 
 class TestRSpecParser(unittest.TestCase):
     """Test RSpec JSON parser."""
@@ -168,6 +311,433 @@ ok 3 - another test passes"""
         self.assertFalse(failed_test.passed)
         self.assertEqual(failed_test.name, "test fails")
 
+    def test_line_classification(self):
+        tap_content = """1..4 # t/lines.t
+OK 1 - upper case status
+not ok - numberless # got 2
+#   Expected: 1
+# SKIP not a directive line
+1..x
+okay
+Not Ok 4"""
+
+        result = self.parser.parse(tap_content)
+        tests = result.file_results[0].test_results
+
+        self.assertEqual(result.file_results[0].file_path, "t/lines.t")
+        self.assertEqual(
+            [(t.name, t.line, t.passed) for t in tests],
+            [
+                ("upper case status", 2, True),
+                ("numberless # got 2", 3, False),
+                # The status needs no separator from the description
+                ("ay", 7, True),
+                ("test 4", 8, False),
+            ],
+        )
+        self.assertEqual(tests[3].actual, "Expected: 1")
+
+    def test_line_splitting(self):
+        tap_content = (
+            "1..3\r\n"
+            "ok 1 - crlf\r\n"
+            "    ok 2 - indented subtest\r\n"
+            "not ok 3 - page\x0cbreak kept\r\n"
+        )
+
+        tests = self.parser.parse(tap_content).file_results[0].test_results
+
+        # Only "\n" ends a line, so reported line numbers match the source
+        self.assertEqual(
+            [(t.name, t.line) for t in tests],
+            [
+                ("crlf", 2),
+                ("indented subtest", 3),
+                ("page\x0cbreak kept", 4),
+            ],
+        )
+
+    def test_outcome_counts(self):
+        tap_content = """1..5
+ok 1 - passes
+# Error: connection refused
+not ok 2 - raises
+not ok 3 - fails
+not ok 4 - expected failure # TODO later"""
+
+        result = self.parser.parse(tap_content)
+
+        # The plan mismatch is reported as one more error
+        self.assertEqual(
+            (
+                result.total_tests,
+                result.passed_tests,
+                result.failed_tests,
+                result.error_tests,
+            ),
+            (5, 2, 1, 2),
+        )
+
+    def test_extract_file_path(self):
+        parser = TAPParser()
+        cases = [
+            # A source file anywhere wins over an earlier path-like string
+            (
+                "see lib/util then t/basic.t and spec/user_spec.rb:12",
+                "spec/user_spec.rb",
+            ),
+            # Source files must be followed by whitespace, ":" or "["
+            ("at lib/util and user_spec.rb", "lib/util"),
+            ("tests/test_app.py[param]", "tests/test_app.py"),
+            # Path-like strings need a "/" with a character on both sides
+            ("x/ and /usr/bin/ but not /", "/usr/bin/"),
+            ("nothing here / at all", None),
+            ("a" * 20000, None),
+        ]
+        for text, expected in cases:
+            with self.subTest(text=text[:40]):
+                self.assertEqual(parser._extract_file_path(text), expected)
+
+    def test_build_test_data_counts(self):
+        files = [
+            ParsedFileResult(
+                file_path="a.t",
+                test_results=[
+                    ParsedTestResult(name="ok", passed=True),
+                    # A passing test's stray message does not make it an error
+                    ParsedTestResult(name="noisy", passed=True, error_message="x"),
+                    ParsedTestResult(name="fail", passed=False),
+                ],
+            ),
+            ParsedFileResult(
+                file_path="b.t",
+                test_results=[
+                    ParsedTestResult(name="boom", passed=False, error_message="")
+                ],
+            ),
+            ParsedFileResult(file_path="c.t", test_results=[]),
+        ]
+
+        data = self.parser._build_test_data(file_results=files)
+
+        self.assertEqual(
+            (data.total_tests, data.passed_tests, data.failed_tests, data.error_tests),
+            (4, 2, 1, 1),
+        )
+        self.assertEqual(data.total_files, 3)
+        self.assertEqual(data.files_with_failures, 2)
+
+
+class TestFormatDetection(unittest.TestCase):
+    """Test input format auto-detection."""
+
+    def setUp(self):
+        from tpane.__main__ import InputFormat, detect_format
+
+        self.InputFormat = InputFormat
+        self.detect_format = detect_format
+
+    def test_detects_each_format(self):
+        cases = [
+            ('<?xml version="1.0"?>\n<testsuite name="s"/>', self.InputFormat.JUNIT),
+            ("1..2\nok 1 - passes\nok 2 - passes", self.InputFormat.TAP),
+            ("TAP version 13\n1..1\nok 1", self.InputFormat.TAP),
+            ('{"examples": [], "summary": {}}', self.InputFormat.RSPEC),
+            ("FAILED test_x.py::test_y - assert 1 == 2", self.InputFormat.PYTEST),
+        ]
+
+        for content, expected in cases:
+            with self.subTest(expected=expected):
+                self.assertEqual(self.detect_format(content), expected)
+
+    def test_json_without_rspec_keys_falls_back_to_pytest(self):
+        self.assertEqual(self.detect_format('{"results": []}'), self.InputFormat.PYTEST)
+
+    def test_large_json_without_examples_key_is_not_parsed(self):
+        from unittest import mock
+
+        import tpane.__main__ as cli
+
+        content = '{"results": [' + ", ".join(["1"] * 5000) + "]}"
+        with mock.patch.object(cli, "_json_loads") as json_loads:
+            self.assertEqual(self.detect_format(content), self.InputFormat.PYTEST)
+        json_loads.assert_not_called()
+
+    def test_only_inspects_leading_content(self):
+        content = "x" * 10_000 + "\n1..1"
+        self.assertEqual(self.detect_format(content), self.InputFormat.PYTEST)
+
+
+class TestParserSelection(unittest.TestCase):
+    """Test parser lookup by input format."""
+
+    def test_parsers_are_shared_and_pytest_is_the_fallback(self):
+        from tpane.__main__ import InputFormat, get_parser
+
+        expected = {
+            InputFormat.JUNIT: JUnitParser,
+            InputFormat.TAP: TAPParser,
+            InputFormat.PYTEST: PytestParser,
+            InputFormat.RSPEC: RSpecParser,
+            InputFormat.AUTO: PytestParser,
+        }
+        for format_type, parser_class in expected.items():
+            with self.subTest(format_type=format_type):
+                parser = get_parser(format_type)
+                self.assertIsInstance(parser, parser_class)
+                self.assertIs(get_parser(format_type), parser)
+
+
+class TestInputLoading(unittest.TestCase):
+    """Test reading input files."""
+
+    def setUp(self):
+        import tempfile
+
+        self.tmpdir = tempfile.TemporaryDirectory()
+        self.addCleanup(self.tmpdir.cleanup)
+
+    def _write(self, name, data):
+        path = Path(self.tmpdir.name) / name
+        path.write_bytes(data)
+        return str(path)
+
+    def test_junit_file_is_streamed(self):
+        from unittest import mock
+
+        import tpane.__main__ as cli
+
+        xml = b'<?xml version="1.0"?>\n<testsuite tests="1"><testcase name="t"/></testsuite>'
+        path = self._write("results.xml", xml)
+
+        for threshold in (cli.MMAP_THRESHOLD, 0):
+            with self.subTest(threshold=threshold):
+                with mock.patch.object(cli, "MMAP_THRESHOLD", threshold):
+                    input_format, source = cli.load_input(
+                        path, 50, cli.InputFormat.AUTO
+                    )
+                self.assertEqual(input_format, cli.InputFormat.JUNIT)
+                result = JUnitParser().parse_stream(source)
+                self.assertEqual(result.total_tests, 1)
+
+    def test_explicit_rspec_file_is_parsed_from_bytes(self):
+        import io
+
+        import tpane.__main__ as cli
+
+        report = '{"examples": [{"full_description": "caf\u00e9 works", '
+        report += '"status": "passed"}], "summary": {"example_count": 1}}'
+        path = self._write("rspec.json", report.encode("utf-8"))
+        input_format, source = cli.load_input(path, 50, cli.InputFormat.RSPEC)
+        self.assertEqual(input_format, cli.InputFormat.RSPEC)
+        self.assertNotIsInstance(source, str)
+        self.assertEqual(RSpecParser().parse_stream(source).total_tests, 1)
+
+        fallback = RSpecParser().parse_stream(io.BytesIO(b"\xff example failed"))
+        self.assertEqual(fallback.total_files, 1)
+
+    def test_text_file_uses_universal_newlines(self):
+        import tpane.__main__ as cli
+
+        path = self._write("output.txt", b"FAILED a.py::t\r\n1 failed\r\n")
+        input_format, source = cli.load_input(path, 50, cli.InputFormat.AUTO)
+        self.assertEqual(input_format, cli.InputFormat.PYTEST)
+        self.assertEqual(source, "FAILED a.py::t\n1 failed\n")
+
+    def test_stdin_junit_is_streamed(self):
+        import io
+        from unittest import mock
+
+        import tpane.__main__ as cli
+
+        xml = b'<?xml version="1.0"?>\n<testsuite tests="1"><testcase name="t"/></testsuite>'
+        stdin = io.TextIOWrapper(io.BytesIO(xml))
+        with mock.patch.object(sys, "stdin", stdin):
+            input_format, source = cli.load_input("-", 50, cli.InputFormat.AUTO)
+            self.assertEqual(input_format, cli.InputFormat.JUNIT)
+            self.assertNotIsInstance(source, str)
+            self.assertEqual(JUnitParser().parse_stream(source).total_tests, 1)
+
+    def test_limited_reader_enforces_limit(self):
+        import io
+
+        import tpane.__main__ as cli
+
+        exact = io.BufferedReader(cli.LimitedReader(io.BytesIO(b"abcd"), 4, 1))
+        self.assertEqual(exact.read(), b"abcd")
+
+        over = io.BufferedReader(cli.LimitedReader(io.BytesIO(b"abcde"), 4, 1))
+        with self.assertRaises(cli.InputTooLargeError):
+            over.read()
+
+
+class TestYAMLOutput(unittest.TestCase):
+    """Test YAML serialization of TOPAZ documents."""
+
+    def test_matches_safe_dump(self):
+        import io
+
+        import yaml
+
+        from tpane.core.yaml_output import write_yaml
+
+        document = {
+            "summary": {"passed": 1, "failed": 0, "elapsed": None},
+            "spec/a_spec.rb": [
+                {"L12": "test failed", "Expected": "true", "Got": "123"},
+                {"L14": "error occurred", "Error": "line one\nline two: x"},
+                {"L20": "test failed", "Test": "handles naïve café ✓"},
+            ],
+            "empty": [],
+            "": {"flag": False, "ratio": 0.5},
+        }
+
+        stream = io.BytesIO()
+        write_yaml(document, stream)
+        output = stream.getvalue().decode("utf-8")
+
+        expected = yaml.dump(
+            document, default_flow_style=False, sort_keys=False, allow_unicode=True
+        )
+        self.assertEqual(yaml.safe_load(output), document)
+        self.assertEqual(yaml.safe_load(expected), yaml.safe_load(output))
+
+    def test_json_output_matches_stdlib(self):
+        import json
+
+        import tpane.__main__ as cli
+        from tpane.core.encoder import TOPAZEncoder
+        from tpane.core.token_budget import TokenBudget
+
+        data = PytestParser()._build_test_data(
+            file_results=[
+                ParsedFileResult(
+                    file_path="tests/test_café.py",
+                    test_results=[
+                        ParsedTestResult(name="ok", passed=True),
+                        ParsedTestResult(name="bad", line=3, passed=False),
+                    ],
+                )
+            ]
+        )
+        document = TOPAZEncoder("failures", TokenBudget(1000)).encode(data)
+
+        # Unset fields are left out of the encoded document, not written as null
+        self.assertNotIn("null", cli._json_dumps(document).decode("utf-8"))
+        self.assertEqual(
+            cli._json_dumps(document),
+            (json.dumps(document, indent=2, ensure_ascii=False) + "\n").encode(),
+        )
+
+
+class TestV3Encoder(unittest.TestCase):
+    """Test the TOPAZ v0.3 encoder."""
+
+    def test_context_probes_run_once_per_process(self):
+        import subprocess
+        from unittest import mock
+
+        from tpane.core import encoder_v3
+        from tpane.core.encoder_v3 import TOPAZV3Encoder
+        from tpane.core.schema import ParsedTestData
+
+        for probe in (encoder_v3._pip_package_manager, encoder_v3._git_vcs_info):
+            probe.cache_clear()
+            self.addCleanup(probe.cache_clear)
+
+        completed = subprocess.CompletedProcess([], 0, stdout="pip 24.0 from x\n")
+        with mock.patch.object(subprocess, "run", return_value=completed) as run:
+            first = TOPAZV3Encoder().encode(ParsedTestData())
+            calls = run.call_count
+            second = TOPAZV3Encoder().encode(ParsedTestData())
+
+        self.assertGreater(calls, 0)
+        self.assertEqual(run.call_count, calls)
+        self.assertEqual(
+            first["EXECUTION_CONTEXT"]["package_manager"],
+            second["EXECUTION_CONTEXT"]["package_manager"],
+        )
+
+    def test_execution_context_to_dict(self):
+        from tpane.core.schema import ExecutionContext, ProjectType
+
+        context = ExecutionContext(
+            command="pytest -q",
+            pid=42,
+            pwd="/src",
+            runtime="python 3.12 (linux)",
+            test_framework="pytest (process)",
+            files_under_test=3,
+            protocol="TOPAZ v0.3 | focus: failures | limit: 1000",
+            environment={"CI": "true", "LANG": "C"},
+        )
+        self.assertEqual(context.to_dict()["pid"], "42 | pwd: /src")
+        self.assertEqual(context.to_dict()["environment"], "CI=true, LANG=C")
+        self.assertNotIn("flags", context.to_dict())
+
+        # Records are mutable, so the compact strings are built at serialization
+        context.flags = ["quiet", "verbose"]
+        context.project_type = ProjectType.PYTHON_PACKAGE
+        result = context.to_dict()
+        self.assertEqual(result["flags"], "quiet, verbose")
+        self.assertEqual(result["project_type"], "python_package")
+
+    def test_project_type_detection(self):
+        import tempfile
+
+        from tpane.core.encoder_v3 import _project_type_for
+        from tpane.core.schema import ProjectType
+
+        cases = [
+            ([], ProjectType.GENERIC),
+            (["App.csproj"], ProjectType.DOTNET),
+            (["config/routes.rb"], ProjectType.RAILS),
+            (["config/other.rb", "go.mod"], ProjectType.GO_MODULE),
+            (["pyproject.toml", "package.json"], ProjectType.NODE_PACKAGE),
+        ]
+        for files, expected in cases:
+            with self.subTest(files=files), tempfile.TemporaryDirectory() as tmp:
+                for name in files:
+                    path = Path(tmp) / name
+                    path.parent.mkdir(parents=True, exist_ok=True)
+                    path.touch()
+                self.assertEqual(_project_type_for(Path(tmp)), expected)
+
+    def test_exhausted_budget_keeps_only_first_failure(self):
+        from tpane.core.encoder_v3 import TOPAZV3Encoder
+        from tpane.core.token_budget import TokenBudget
+
+        data = PytestParser()._build_test_data(
+            file_results=[
+                ParsedFileResult(
+                    file_path=f"tests/test_{name}.py",
+                    test_results=[
+                        ParsedTestResult(name="test_ok", passed=True),
+                        ParsedTestResult(name="test_one", line=4, passed=False),
+                        ParsedTestResult(
+                            name="test_two", line=9, passed=False, error_message="x"
+                        ),
+                    ],
+                )
+                for name in ("a", "b")
+            ]
+        )
+
+        failures = TOPAZV3Encoder("failures")._build_failures(data)
+        self.assertEqual([len(v) for v in failures.values()], [2, 2])
+        self.assertEqual(
+            [f.description for f in failures["tests/test_a.py"]],
+            ["test failed", "error occurred"],
+        )
+
+        budget = TokenBudget(10)
+        budget.consume("x" * 100)
+        failures = TOPAZV3Encoder("failures", budget)._build_failures(data)
+        self.assertEqual(list(failures), ["tests/test_a.py"])
+        self.assertEqual(
+            [f.test_name for f in failures["tests/test_a.py"]], ["test_one"]
+        )
+
 
 class TestTokenBudget(unittest.TestCase):
     """Test token budget management."""
@@ -186,6 +756,31 @@ class TestTokenBudget(unittest.TestCase):
         self.assertGreater(tokens, 0)
         self.assertLess(tokens, 10)  # Should be reasonable
 
+    def test_would_exceed(self):
+        budget = self.TokenBudget(100)  # 50 tokens of headroom
+
+        self.assertFalse(budget.would_exceed("x" * 133))
+        # Long text can still fit once whitespace and punctuation are counted
+        self.assertFalse(budget.would_exceed(" " * 300))
+        self.assertTrue(budget.would_exceed(":" * 200))
+
+        budget.consumed = 101
+        self.assertTrue(budget.would_exceed(""))
+
+    def test_truncation_boundaries(self):
+        budget = self.TokenBudget(1000)
+        text = "One. Two three four. five six seven"
+
+        # Sentence and word breaks are only used past the halfway mark
+        self.assertEqual(
+            budget._truncate_intelligently(text, 25), "One. Two three four."
+        )
+        self.assertEqual(budget._truncate_intelligently(text, 20), "One. Two three...")
+        self.assertEqual(
+            budget._truncate_intelligently("a. " + "x" * 40 + " y", 30),
+            "a. " + "x" * 24 + "...",
+        )
+
     def test_budget_consumption(self):
         budget = self.TokenBudget(100)
 
@@ -217,15 +812,129 @@ class TestEdgeCases(unittest.TestCase):
                 self.assertIsInstance(result, type(parser.parse("")))
                 self.assertEqual(result.total_tests, 0)
 
+    def test_test_result_to_dict_omits_unset_fields(self):
+        """Test that TestResult.to_dict keeps key order and drops None fields."""
+        from tpane.core.schema import TestResult, TestType
+
+        failure = TestResult(
+            line=0, name="", type=TestType.FAILURE, expected="1", actual="2"
+        )
+        error = TestResult(line=7, name="test_two", type=TestType.ERROR, error="x")
+
+        self.assertEqual(
+            list(failure.to_dict().items()),
+            [
+                ("line", 0),
+                ("name", ""),
+                ("type", "failure"),
+                ("expected", "1"),
+                ("actual", "2"),
+            ],
+        )
+        self.assertEqual(list(error.to_dict()), ["line", "name", "type", "error"])
+        # A plain str, not the str-based enum member, so YAML writes a bare scalar
+        self.assertIs(type(error.to_dict()["type"]), str)
+
+    def test_v3_failure_to_dict_layout(self):
+        """Test the v0.3 failure record's renamed keys and optional fields."""
+        from tpane.core.schema import V3FailureResult
+
+        bare = V3FailureResult(line=4, description="test failed", test_name="t")
+        full = V3FailureResult(
+            line=9,
+            description="test failed",
+            test_name="t",
+            expected="1",
+            actual="2",
+            diff_removed="a",
+            diff_added="b",
+        )
+
+        self.assertEqual(bare.to_dict(), {"L4": "test failed", "Test": "t"})
+        self.assertEqual(
+            list(full.to_dict().items()),
+            [
+                ("L9", "test failed"),
+                ("Test", "t"),
+                ("Expected", "1"),
+                ("Got", "2"),
+                ("Diff", ["- a", "+ b"]),
+            ],
+        )
+        # Empty values are still reported; empty diff lines are not
+        empty = V3FailureResult(
+            line=4, description="test failed", test_name="t", expected="", diff_added=""
+        )
+        self.assertEqual(
+            empty.to_dict(), {"L4": "test failed", "Test": "t", "Expected": ""}
+        )
+
+    def test_normalize_flags(self):
+        """Test flag aliases map to sorted, de-duplicated TOPAZ terms."""
+        from tpane.core.schema import FLAG_MAPPINGS, normalize_flags
+
+        aliases = [alias for group in FLAG_MAPPINGS.values() for alias in group]
+        self.assertEqual(len(aliases), len(set(aliases)))
+        self.assertEqual(
+            normalize_flags(["--verbose", "-x", "-q", "-v", "--tb=long"]),
+            ["quiet", "traces", "verbose"],
+        )
+        self.assertEqual(normalize_flags([]), [])
+        self.assertEqual(normalize_flags(["-d", "DEBUG=1", "--debug", "-x"]), ["debug"])
+        self.assertEqual(normalize_flags(["-n", "-f"]), ["fails-only", "parallel"])
+
     def test_malformed_xml(self):
-        """Test JUnit parser handles malformed XML."""
+        """Test JUnit parser falls back to text parsing on malformed XML."""
+        import io
+        from unittest import mock
+
+        import tpane.parsers.junit as junit
+        from tpane.core.schema import TestStatus
+
         parser = JUnitParser()
+        cases = {
+            "unclosed": "<testsuite><testcase name='test' unclosed>\n<failure/>",
+            "truncated": """<testsuite name="S" tests="2" failures="1">
+  <testcase name="a"/>
+  <testcase name="b">
+    <failure message="boom">trace""",
+            "mismatched tag": """<testsuite tests="1" failures="1">
+  <testcase name="a"><failure message="boom"></testcase>
+</testsuite>""",
+            "two roots": """<testsuite tests="1"><testcase name="a"/></testsuite>
+<testsuite tests="1"><testcase name="b"><failure/></testcase></testsuite>""",
+        }
+
+        # Recovering silently would depend on whether lxml is installed
+        for lxml_etree in (junit.lxml_etree, None):
+            for name, malformed_xml in cases.items():
+                with mock.patch.object(junit, "lxml_etree", lxml_etree):
+                    streamed = parser.parse_stream(
+                        io.BytesIO(malformed_xml.encode("utf-8"))
+                    )
+                    result = parser.parse(malformed_xml)
+                with self.subTest(case=name, lxml=lxml_etree is not None):
+                    self.assertEqual(streamed, result)
+                    self.assertEqual(
+                        [f.file_path for f in result.file_results],
+                        ["junit_parse_error.xml"],
+                    )
+                    self.assertEqual(result.overall_status, TestStatus.FAIL)
 
-        malformed_xml = "<testsuite><testcase name='test' unclosed>"
-        result = parser.parse(malformed_xml)
+    def test_declared_encoding_is_ignored_for_text(self):
+        """Test decoded text is parsed as-is whatever encoding it declares."""
+        from unittest import mock
 
-        # Should fallback to text parsing and not crash
-        self.assertIsInstance(result, type(parser.parse("")))
+        import tpane.parsers.junit as junit
+
+        xml_content = """<?xml version="1.0" encoding="ISO-8859-1"?>
+<testsuite tests="1"><testcase name="café"/></testsuite>"""
+
+        for lxml_etree in (junit.lxml_etree, None):
+            with mock.patch.object(junit, "lxml_etree", lxml_etree):
+                result = JUnitParser().parse(xml_content)
+            with self.subTest(lxml=lxml_etree is not None):
+                self.assertEqual(result.file_results[0].test_results[0].name, "café")
 
     def test_unicode_handling(self):
         """Test parsers handle Unicode content."""
@@ -277,6 +986,45 @@ class TestEdgeCases(unittest.TestCase):
                 self.assertIsInstance(normalized, str)
                 self.assertGreater(len(normalized), 0)  # Should never return empty
 
+    def test_path_normalization_reads_cwd_once(self):
+        """Test encoders resolve the working directory and each path once."""
+        from unittest import mock
+
+        from tpane.core.encoder import TOPAZEncoder
+        from tpane.core.encoder_v3 import TOPAZV3Encoder
+
+        cwd = Path.cwd()
+        absolute = str(cwd / "spec" / "models" / "deeply" / "nested" / "user_spec.rb")
+        for encoder_class in (TOPAZEncoder, TOPAZV3Encoder):
+            with self.subTest(encoder=encoder_class.__name__):
+                encoder = encoder_class()
+                with mock.patch.object(Path, "cwd", side_effect=AssertionError):
+                    normalized = encoder._normalize_path(absolute)
+                self.assertEqual(
+                    normalized, str(Path("spec/models/deeply/nested/user_spec.rb"))
+                )
+                # Repeated paths come from the cache as the same object
+                self.assertIs(encoder._normalize_path(absolute), normalized)
+
+    def test_shorten_normalized_path_matches_pathlib_fallback(self):
+        """Test string-only path shortening agrees with the Path-based code."""
+        from tpane.core.schema import shorten_normalized_path
+
+        long_dir = "d" * 40
+        cases = [
+            ("/work/repo/spec/user_spec.rb", "spec/user_spec.rb"),
+            ("spec/user_spec.rb", "spec/user_spec.rb"),
+            (f"spec/{long_dir}/models/user_spec.rb", "models/user_spec.rb"),
+            (f"{long_dir}/test_user.rb", f"{long_dir}/test_user.rb"),
+            (f"{long_dir}/{long_dir}/x", "x"),
+            ("/elsewhere/spec/user_spec.rb", None),
+            ("spec//user_spec.rb", None),
+            ("spec/../../etc/passwd", None),
+        ]
+        for path, expected in cases:
+            with self.subTest(path=path):
+                self.assertEqual(shorten_normalized_path(path, "/work/repo/"), expected)
+
     def test_token_budget_edge_cases(self):
         """Test token budget with edge cases."""
         sys.path.insert(0, str(Path(__file__).parent.parent / "src"))
@@ -301,6 +1049,21 @@ class TestEdgeCases(unittest.TestCase):
 class TestSecurityEdgeCases(unittest.TestCase):
     """Test security-related edge cases and malicious input handling."""
 
+    def test_assertion_extraction_is_bounded(self):
+        """Test long failure text cannot make assertion extraction backtrack.
+
+        An unbounded "expected: X .*? got: Y" search takes minutes on these.
+        """
+        parser = PytestParser()
+        for text in (
+            "expected: x " * 5000,
+            "expected x " * 5000,
+            "assert x " * 5000,
+            "expected: a got: b" + " x" * 20000,
+        ):
+            with self.subTest(text=text[:20]):
+                parser._extract_assertion_values(text)
+
     def test_xml_bomb_prevention(self):
         """Test protection against XML bombs (if defusedxml is available)."""
         parser = JUnitParser()
@@ -422,6 +1185,10 @@ class TestSecurityEdgeCases(unittest.TestCase):
                 "/etc/passwd",
                 "passwd",
             ),  # Absolute system path should be sanitized to filename only
+            (
+                "vendor/proc/loader.rb",
+                "loader.rb",
+            ),  # System-like segment inside a relative path is sanitized too
             ("normal_file.rb", "normal_file.rb"),  # Normal files unchanged
             (
                 "spec/user_spec.rb",
@@ -463,6 +1230,46 @@ class TestResourceConstraints(unittest.TestCase):
         self.assertIsInstance(result, type(parser.parse("")))
         self.assertGreaterEqual(result.total_tests, 1)
 
+    def test_per_test_records_have_no_instance_dict(self):
+        """Test that per-test and per-file records are slotted to keep them small."""
+        from tpane.core.schema import (
+            FileSummary,
+            ParsedFileResult,
+            ParsedTestResult,
+            TestResult,
+            TestType,
+            V3FailureResult,
+        )
+
+        parsed = ParsedTestResult(name="test_one", line=3, passed=False)
+        result = TestResult(line=3, name="test_one", type=TestType.FAILURE)
+        records = (
+            parsed,
+            result,
+            V3FailureResult(line=3, description="test failed", test_name="test_one"),
+            ParsedFileResult(file_path="test_one.py", test_results=[parsed]),
+            FileSummary(file="test_one.py", tests=[result]),
+        )
+
+        for record in records:
+            self.assertFalse(hasattr(record, "__dict__"))
+            with self.assertRaises(AttributeError):
+                record.undeclared = True
+        self.assertTrue(parsed.is_failure)
+
+    def test_file_summary_issue_counts(self):
+        from tpane.core.schema import FileSummary, TestResult, TestType
+
+        types = [TestType.FAILURE, TestType.ERROR, TestType.FAILURE]
+        summary = FileSummary(
+            file="test_one.py",
+            tests=[TestResult(line=1, name="t", type=kind) for kind in types],
+        )
+
+        self.assertEqual(summary.issue_counts(), (2, 1))
+        self.assertEqual((summary.failure_count(), summary.error_count()), (2, 1))
+        self.assertEqual(FileSummary(file="empty.py").issue_counts(), (0, 0))
+
     def test_deeply_nested_xml(self):
         """Test handling of deeply nested XML structures."""
         parser = JUnitParser()